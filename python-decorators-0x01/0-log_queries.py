@@ -1,17 +1,172 @@
 import sqlite3
 import functools
+import atexit
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
+from json.encoder import encode_basestring_ascii
 
-from datetime import datetime
-#### decorator to log SQL queries
+#### structured, sampled query log drained by a background writer
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+@functools.lru_cache(maxsize=1024)
+def redact_query(query):
+    """Replaces string and numeric literals in query with ?."""
+    return _LITERAL.sub("?", query)
+
+@functools.lru_cache(maxsize=1024)
+def _json_query(query):
+    return encode_basestring_ascii(redact_query(query)) if query else 'null'
+
+@functools.lru_cache(maxsize=256)
+def _json_string(value):
+    return encode_basestring_ascii(value)
+
+@functools.lru_cache(maxsize=64)
+def _json_params(count):
+    return '[' + ', '.join(['"?"'] * count) + ']'
+
+@functools.lru_cache(maxsize=4)
+def _second(seconds):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(seconds))
+
+def _format(record):
+    timestamp, function, query, slow, duration, params = record
+    seconds = int(timestamp)
+    return (
+        f'{{"ts": "{_second(seconds)}.{int((timestamp - seconds) * 1e6):06d}", '
+        f'"function": {_json_string(function)}, "query": {_json_query(query)}, '
+        f'"params": {_json_params(params)}, "duration_ms": {duration * 1000:.3f}, '
+        f'"slow": {"true" if slow else "false"}}}\n'
+    )
+
+class QueryLogger:
+    """Ring buffer of query records written out by a daemon thread.
+
+    Callers only append to a bounded deque; formatting, redaction and I/O
+    happen on the writer thread. When the buffer is full the oldest records
+    are overwritten and counted in dropped. Records that cannot be formatted
+    or written are counted in failed instead of stopping the writer;
+    stats() reports all three counts.
+    """
+
+    def __init__(self, capacity=10000, flush_interval=0.5, stream=None):
+        self.records = deque(maxlen=capacity)
+        self.flush_interval = flush_interval
+        self.stream = stream
+        self.logged = 0
+        self.dropped = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._high_water = capacity // 2
+        self._thread = None
+
+    def submit(self, record):
+        if self._thread is None:
+            self._start()
+        pending = len(self.records)
+        if pending == self.records.maxlen:
+            self.dropped += 1
+        self.records.append(record)
+        if record[3] or pending >= self._high_water:
+            self._wakeup.set()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='query-logger', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # flush() already counted the lost lines; keep the writer alive.
+                pass
+
+    def flush(self):
+        """Writes every buffered record as one JSON line."""
+        with self._lock:
+            if not self.records:
+                return
+            lines = []
+            while self.records:
+                try:
+                    lines.append(_format(self.records.popleft()))
+                except Exception:
+                    self.failed += 1
+            stream = self.stream or sys.stdout
+            try:
+                stream.write(''.join(lines))
+                stream.flush()
+            except Exception:
+                self.failed += len(lines)
+                raise
+            self.logged += len(lines)
+
+    def stats(self):
+        """Returns how many records were written, dropped, failed and are still pending."""
+        return {'logged': self.logged, 'dropped': self.dropped, 'failed': self.failed,
+                'pending': len(self.records)}
+
+query_logger = QueryLogger()
+
+def _query_and_params(args, kwargs):
+    """Finds the query (the query argument, else the first positional str,
+    which skips a leading conn) and the params following it."""
+    query = kwargs.get('query')
+    params = kwargs.get('params')
+    if query is None:
+        for position, arg in enumerate(args):
+            if isinstance(arg, str):
+                query = arg
+                if params is None and position + 1 < len(args):
+                    params = args[position + 1]
+                break
+    return (query if isinstance(query, str) else None), params
+
+def _count(params):
+    if params is None:
+        return 0
+    return len(params) if isinstance(params, (list, tuple, dict)) else 1
+
+def log_queries(func=None, *, sample_rate=0.01, slow_ms=100, logger=query_logger):
+    """Logs a sample_rate fraction of calls (1% by default), plus every call
+    slower than slow_ms.
+
+    Usable bare (@log_queries) or with options (@log_queries(sample_rate=0.01)).
+    The query comes from the query argument, or the first positional string
+    so (conn, query) functions work too; parameters are logged redacted.
+    """
+    if func is None:
+        return functools.partial(log_queries, sample_rate=sample_rate, slow_ms=slow_ms, logger=logger)
+
+    slow_seconds = slow_ms / 1000
+    name = func.__qualname__
 
-def log_queries(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        print(f"[log_queries] Executing SQL query: {args[0]} at {datetime.now()}")        
-        return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            slow = duration >= slow_seconds
+            if slow or random.random() < sample_rate:
+                query, params = _query_and_params(args, kwargs)
+                logger.submit((time.time(), name, query, slow, duration, _count(params)))
     return wrapper
 
-@log_queries
+@log_queries(sample_rate=1.0)
 def fetch_all_users(query):
     conn = sqlite3.connect('users.db')
     cursor = conn.cursor()
@@ -21,4 +176,4 @@ def fetch_all_users(query):
     return results
 
 #### fetch users while logging the query
-users = fetch_all_users(query="SELECT * FROM users")
\ No newline at end of file
+users = fetch_all_users(query="SELECT * FROM users")
@@ -1,16 +1,13 @@
-import sqlite3
 import functools
 
+from db_pool import get_pool
+
 def with_db_connection(func):
-    """Decorator that automatically handles database connection opening and closing"""
+    """Decorator that lends the function a pooled database connection"""
     @functools.wraps(func)
-    def wrapper(*args, **kwargs): 
-        conn = sqlite3.connect('users.db')
-        try: 
-            result = func(conn, *args, **kwargs)
-            return result
-        finally: 
-            conn.close()
+    def wrapper(*args, **kwargs):
+        with get_pool().connection() as conn:
+            return func(conn, *args, **kwargs)
     return wrapper
 
 @with_db_connection
@@ -1,32 +1,31 @@
-import sqlite3 
 import functools
 
+from cache import invalidating_writes
+from db_pool import get_pool
+
 """your code goes here"""
 
 def with_db_connection(func):
-    """Decorator that automatically handles database connection opening and closing"""
+    """Decorator that lends the function a pooled database connection"""
     @functools.wraps(func)
-    def wrapper(*args, **kwargs): 
-        conn = sqlite3.connect('users.db')
-        try: 
-            result = func(conn, *args, **kwargs)
-            return result
-        finally: 
-            conn.close()
+    def wrapper(*args, **kwargs):
+        with get_pool().connection() as conn:
+            return func(conn, *args, **kwargs)
     return wrapper
 
 def transactional(func):
-    """Decorator that automatically handles transactions"""
+    """Decorator that automatically handles transactions and, after a commit,
+    evicts cached results of the tables written"""
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
-        cursor = conn.cursor()
-        try:
-            result = func(conn, *args, **kwargs)
-            conn.commit()
-            return result
-        except Exception as e:
-            conn.rollback()
-            raise e
+        with invalidating_writes(conn):
+            try:
+                result = func(conn, *args, **kwargs)
+                conn.commit()
+                return result
+            except Exception as e:
+                conn.rollback()
+                raise e
     return wrapper
 
 @with_db_connection 
@@ -1,32 +1,91 @@
 import time
+import random
 import sqlite3 
 import functools
+import threading
+
+from db_pool import get_pool
 
 def with_db_connection(func):
-    """Decorator that automatically handles database connection opening and closing"""
+    """Decorator that lends the function a pooled database connection"""
     @functools.wraps(func)
-    def wrapper(*args, **kwargs): 
-        conn = sqlite3.connect('users.db')
-        try: 
-            result = func(conn, *args, **kwargs)
-            return result
-        finally: 
-            conn.close()
+    def wrapper(*args, **kwargs):
+        with get_pool().connection() as conn:
+            return func(conn, *args, **kwargs)
     return wrapper
 
-def retry_on_failure(retries=3, delay=1):
-    """Decorator that retries a function if it raises an exception"""
+def is_transient(error):
+    """Default classifier: only a locked or busy database is worth retrying"""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+class RetryBudget:
+    """Token bucket shared by every retrying call in the process.
+
+    Each retry spends a token; tokens refill at rate per second up to
+    capacity. When the bucket is empty callers give up instead of adding
+    more load to a database that is already struggling.
+    """
+
+    def __init__(self, rate=10.0, capacity=20.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_spend(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+retry_budget = RetryBudget()
+
+def retry_on_failure(retries=3, delay=1, max_delay=30, classifier=is_transient, budget=retry_budget):
+    """Decorator that retries transient failures with exponential backoff and full jitter.
+    Attempt n sleeps uniformly between 0 and min(max_delay, delay * 2**n). Errors the
+    classifier rejects, or any failure once the retry budget is spent, are raised at once.
+    Counters are exposed as wrapper.metrics and are safe to share between threads."""
     def decorator(func):
+        metrics = {'calls': 0, 'attempts': 0, 'retries': 0, 'recovered': 0,
+                   'gave_up': 0, 'not_retryable': 0, 'budget_exhausted': 0}
+        lock = threading.Lock()
+
+        def count(*names):
+            with lock:
+                for name in names:
+                    metrics[name] += 1
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
+            count('calls')
             for attempt in range(retries):
+                count('attempts')
                 try:
-                    return func(*args, **kwargs)
+                    result = func(*args, **kwargs)
+                    if attempt:
+                        count('recovered')
+                    return result
                 except Exception as e:
-                    if attempt < retries - 1:
-                        time.sleep(delay)
-                    else:
+                    if not classifier(e):
+                        count('not_retryable')
+                        raise e
+                    if attempt == retries - 1:
+                        count('gave_up')
+                        raise e
+                    if budget is not None and not budget.try_spend():
+                        count('budget_exhausted')
                         raise e
+                    count('retries')
+                    time.sleep(random.uniform(0, min(max_delay, delay * 2 ** attempt)))
+        wrapper.metrics = metrics
         return wrapper
     return decorator
 
@@ -1,37 +1,56 @@
-import time
-import sqlite3 
 import functools
+import inspect
 
-
-query_cache = {}
+from cache import capture_tables, data_version, query_cache
+from db_pool import get_pool
 
 """your code goes here"""
 
 def with_db_connection(func):
-    """Decorator that automatically handles database connection opening and closing"""
+    """Decorator that lends the function a pooled database connection"""
     @functools.wraps(func)
-    def wrapper(*args, **kwargs): 
-        conn = sqlite3.connect('users.db')
-        try: 
-            result = func(conn, *args, **kwargs)
-            return result
-        finally: 
-            conn.close()
+    def wrapper(*args, **kwargs):
+        with get_pool().connection() as conn:
+            return func(conn, *args, **kwargs)
     return wrapper
 
-def cache_query(func):
-    """Decorator that caches the result of a query"""
+def cache_query(func=None, *, ttl=None, stale_ttl=0.0, cache=query_cache):
+    """Decorator that caches query results per database, query and params.
+    Concurrent misses for one key share a single execution; with stale_ttl,
+    expired results are served while a pooled connection refreshes them."""
+    if func is None:
+        return functools.partial(cache_query, ttl=ttl, stale_ttl=stale_ttl, cache=cache)
+    signature = inspect.signature(func)
+    name = f"{func.__module__}.{func.__qualname__}"
+
     @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        query = kwargs.get('query')
-        if query in query_cache:
-            print("Using cached result for query:", query)
-            return query_cache[query]
-        else:
+    def wrapper(conn, *args, **kwargs):
+        bound = signature.bind(conn, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = list(bound.arguments.items())[1:]
+        query = bound.arguments.get('query')
+        key = cache.make_key(conn, query, (name, arguments))
+        in_memory = key[0].startswith(':memory:')
+
+        def run(connection):
             print("Executing query:", query)
-            result = func(*args, **kwargs)
-            query_cache[query] = result
-            return result
+            generation = cache.generation()
+            with capture_tables(connection) as access:
+                result = func(connection, *args, **kwargs)
+            # In-memory databases are private to this connection; keep them off the shared disk tier.
+            version = data_version(connection) if cache.disk is not None and not in_memory else None
+            return result, access.reads, generation, version
+
+        def refresh():
+            with get_pool(key[0]).connection() as pooled:
+                return run(pooled)
+
+        result, status = cache.load(key, lambda: run(conn), ttl, stale_ttl,
+                                    refresh if stale_ttl and not in_memory else None,
+                                    None if in_memory else lambda: data_version(conn))
+        if status != 'loaded':
+            print("Using cached result for query:", query)
+        return result
     return wrapper
 
 
@@ -0,0 +1,134 @@
+import argparse
+import contextlib
+import functools
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+def create_users_db(directory, rows=1000):
+    """Creates users.db with a users table in directory and returns its path."""
+    path = os.path.join(directory, 'users.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)")
+    conn.executemany("INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
+                     [(f"user{i}", f"user{i}@example.com", 18 + i % 60) for i in range(rows)])
+    conn.commit()
+    conn.close()
+    return path
+
+def load_task(name, directory):
+    """Imports a task file (which runs its demo on import) against directory/users.db."""
+    previous = os.getcwd()
+    os.chdir(directory)
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            task = __import__(name)
+            if hasattr(task, 'query_logger'):
+                task.query_logger.flush()
+            return task
+    finally:
+        os.chdir(previous)
+
+def per_call(func, calls, *args, repeat=5, **kwargs):
+    """Returns the mean seconds per call of func, best of repeat rounds of calls / repeat."""
+    rounds = max(calls // repeat, 1)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func(*args, **kwargs)
+        elapsed = (time.perf_counter() - start) / rounds
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def print_logged(func):
+    """The original synchronous log_queries, kept as the baseline."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        print(f"[log_queries] Executing SQL query: {kwargs.get('query')} at {datetime.now()}")
+        return func(*args, **kwargs)
+    return wrapper
+
+def bench_logging(directory, calls=100000):
+    """Measures the per-call overhead of log_queries against an undecorated call."""
+    task = load_task('0-log_queries', directory)
+    devnull = open(os.devnull, 'w')
+
+    def noop(query):
+        return query
+
+    conn = sqlite3.connect(os.path.join(directory, 'users.db'))
+
+    def lookup(query):
+        return conn.execute(query).fetchone()
+
+    query = "SELECT * FROM users WHERE id = 7"
+    for target in (noop, lookup):
+        loggers = {'default (1%)': task.QueryLogger(stream=devnull),
+                   'sampled 100%': task.QueryLogger(stream=devnull)}
+        variants = [
+            ('undecorated', target),
+            ('print (old)', print_logged(target)),
+            ('default (1%)', task.log_queries(target, logger=loggers['default (1%)'])),
+            ('sampled 100%', task.log_queries(target, sample_rate=1.0, logger=loggers['sampled 100%'])),
+        ]
+        baseline = None
+        print(f"{target.__name__}:")
+        timings = []
+        for label, func in variants:
+            with contextlib.redirect_stdout(devnull):
+                timings.append((label, per_call(func, calls, query=query)))
+            if label in loggers:
+                loggers[label].flush()
+        for label, seconds in timings:
+            baseline = seconds if baseline is None else baseline
+            line = f"  {label:<14} {seconds * 1e9:9.0f} ns/call  (+{(seconds - baseline) * 1e9:.0f} ns)"
+            if label in loggers:
+                stats = loggers[label].stats()
+                line += f"  logged {stats['logged']}, dropped {stats['dropped']}, failed {stats['failed']}"
+            print(line)
+    conn.close()
+    devnull.close()
+
+def bench_connections(directory, calls=10000):
+    """Compares connect-per-call against the pooled with_db_connection for a point lookup."""
+    task = load_task('1-with_db_connection', directory)
+    path = os.path.join(directory, 'users.db')
+
+    def connect_per_call(user_id):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+        finally:
+            conn.close()
+
+    previous = os.getcwd()
+    os.chdir(directory)
+    try:
+        opened = per_call(connect_per_call, calls, 7)
+        pooled = per_call(task.get_user_by_id, calls, user_id=7)
+    finally:
+        os.chdir(previous)
+    print(f"connect per call: {opened * 1e6:8.1f} us/call")
+    print(f"pooled:           {pooled * 1e6:8.1f} us/call")
+    print(f"speedup:          {opened / pooled:.1f}x")
+    print(task.get_pool(path).stats())
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for python-decorators-0x01")
+    parser.add_argument('suite', nargs='?', default='logging', choices=('logging', 'connections'))
+    parser.add_argument('--calls', type=int, default=100000)
+    args = parser.parse_args()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as directory:
+        create_users_db(directory)
+        if args.suite == 'logging':
+            bench_logging(directory, args.calls)
+        elif args.suite == 'connections':
+            bench_connections(directory, args.calls)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+#### bounded LRU/TTL cache for query results with table-level invalidation
+
+_WRITES = {sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE}
+
+def estimate_size(value):
+    """Roughly estimates the bytes held by a result set."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+def database_path(conn):
+    """Returns the file behind conn's main database (unique per in-memory database)."""
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == 'main':
+            return path or f":memory:{id(conn)}"
+
+def _freeze(params):
+    if isinstance(params, dict):
+        return tuple(sorted((key, _freeze(value)) for key, value in params.items()))
+    if isinstance(params, (list, tuple)):
+        return tuple(_freeze(value) for value in params)
+    if isinstance(params, (set, frozenset)):
+        return frozenset(_freeze(value) for value in params)
+    return params
+
+class TableAccess:
+    """Tables read and written by the statements prepared during a capture."""
+
+    def __init__(self):
+        self.reads = set()
+        self.writes = set()
+
+_captures = {}
+
+def _authorizer(stack):
+    def authorize(action, table, *_):
+        if table is not None:
+            for access in stack:
+                if action == sqlite3.SQLITE_READ:
+                    access.reads.add(table)
+                elif action in _WRITES:
+                    access.writes.add(table)
+        return sqlite3.SQLITE_OK
+    return authorize
+
+@contextmanager
+def capture_tables(conn):
+    """Records the tables conn's statements touch, via the sqlite3 authorizer.
+
+    Captures may nest. Installing the authorizer expires conn's prepared
+    statements, so cached statements are re-prepared and reported too.
+    """
+    stack = _captures.setdefault(id(conn), [])
+    access = TableAccess()
+    stack.append(access)
+    conn.set_authorizer(_authorizer(stack))
+    try:
+        yield access
+    finally:
+        stack.remove(access)
+        if not stack:
+            del _captures[id(conn)]
+            conn.set_authorizer(None)
+
+class _Entry:
+    __slots__ = ('value', 'size', 'expires', 'stale_until', 'tables')
+
+    def __init__(self, value, size, expires, stale_until, tables):
+        self.value = value
+        self.size = size
+        self.expires = expires
+        self.stale_until = stale_until
+        self.tables = tables
+
+class _Flight:
+    """One in-flight load that concurrent callers for the same key wait on."""
+
+    __slots__ = ('done', 'value', 'error', 'status')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.status = 'loaded'
+
+def data_version(conn):
+    """Returns conn's schema_version and user_version, the tag disk entries carry."""
+    schema = conn.execute("PRAGMA schema_version").fetchone()[0]
+    user = conn.execute("PRAGMA user_version").fetchone()[0]
+    return f"{schema}:{user}"
+
+# What a locked, full or corrupt cache file, or an unreadable pickle, raises.
+DISK_ERRORS = (sqlite3.Error, pickle.PickleError, EOFError, AttributeError, ImportError)
+
+class DiskCache:
+    """Second cache tier: pickled results in a WAL-mode SQLite file.
+
+    Any process on the host can share the file. Entries are tagged with the
+    source database's data_version(); a lookup with a different version
+    drops every entry of that database. When the file grows past max_bytes
+    the least recently read entries are evicted.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key BLOB PRIMARY KEY,
+                db TEXT NOT NULL,
+                version TEXT NOT NULL,
+                tables TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires REAL NOT NULL,
+                accessed REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_db ON entries (db)")
+        self.metrics = {'hits': 0, 'misses': 0, 'stale_versions': 0, 'evictions': 0, 'errors': 0}
+
+    @staticmethod
+    def _digest(key):
+        return hashlib.sha256(pickle.dumps(key)).digest()
+
+    def get(self, key, version):
+        """Returns (value, tables, seconds left) for key, or None."""
+        digest = self._digest(key)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version, tables, value, expires FROM entries WHERE key = ?", (digest,)
+            ).fetchone()
+            if row is not None and row[0] != version:
+                self._conn.execute("DELETE FROM entries WHERE db = ? AND version != ?", (key[0], version))
+                self.metrics['stale_versions'] += 1
+                row = None
+            elif row is not None and row[3] <= now:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (digest,))
+                row = None
+            if row is None:
+                self.metrics['misses'] += 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, digest))
+            self.metrics['hits'] += 1
+        return pickle.loads(row[2]), frozenset(filter(None, row[1].split(','))), row[3] - now
+
+    def put(self, key, value, tables, version, ttl):
+        try:
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return False
+        if len(blob) > self.max_bytes:
+            return False
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._digest(key), key[0], version, f",{','.join(sorted(tables))},",
+                 blob, len(blob), now + ttl, now),
+            )
+            self._evict()
+        return True
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for digest, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            if total <= self.max_bytes:
+                break
+            victims.append((digest,))
+            total -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        self.metrics['evictions'] += len(victims)
+
+    def invalidate(self, db, tables):
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM entries WHERE db = ? AND instr(tables, ?) > 0",
+                [(db, f",{table},") for table in tables],
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            return dict(self.metrics, entries=entries, bytes=size)
+
+    def close(self):
+        self._conn.close()
+
+class QueryCache:
+    """Thread-safe LRU cache bounded by entry count and estimated bytes.
+
+    Keys are (database path, query, params). Entries remember the tables
+    their query read, so invalidate() can drop exactly the results a write
+    made stale. load() runs at most one loader per key at a time and can
+    serve expired entries while a background refresh runs. An optional
+    DiskCache is consulted before running a loader and filled after it.
+    """
+
+    MISS = object()
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300.0, disk=None):
+        self.max_entries = max_entries
+        self.disk = disk
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_table = {}
+        self._invalidated = {}
+        self._inflight = {}
+        self._generation = 0
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.metrics = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0,
+                        'coalesced': 0, 'stale_hits': 0, 'refreshes': 0, 'refresh_errors': 0}
+
+    def make_key(self, conn, query, params=()):
+        return (database_path(conn), query, _freeze(params or ()))
+
+    def generation(self):
+        """Returns a token to pass to set(), taken before running the query."""
+        return self._generation
+
+    def get(self, key):
+        """Returns the cached value for key, or QueryCache.MISS."""
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if entry is not None and entry.expires <= now:
+                if entry.stale_until <= now:
+                    self._remove(key)
+                    self.metrics['expirations'] += 1
+                entry = None
+            if entry is None:
+                self.metrics['misses'] += 1
+                return self.MISS
+            self._entries.move_to_end(key)
+            self.metrics['hits'] += 1
+            return entry.value
+
+    def load(self, key, loader, ttl=None, stale_ttl=0.0, refresh=None, version=None):
+        """Returns (value, status) for key, calling loader() on a miss.
+
+        loader and refresh return (value, tables read, generation, version).
+        On a miss the disk tier is checked first (status 'disk') using the
+        version() callable. Callers
+        that miss while another thread loads the same key wait for its result
+        (status 'coalesced') instead of running the query again. With a
+        refresh function, an entry less than stale_ttl past its TTL is
+        returned (status 'stale') while one background thread refreshes it.
+        """
+        leader = False
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if entry is not None and now < entry.expires:
+                self._entries.move_to_end(key)
+                self.metrics['hits'] += 1
+                return entry.value, 'hit'
+            flight = self._inflight.get(key)
+            if entry is not None and now < entry.stale_until and refresh is not None:
+                self.metrics['stale_hits'] += 1
+                if flight is None:
+                    flight = self._inflight[key] = _Flight()
+                    self.metrics['refreshes'] += 1
+                    threading.Thread(target=self._fly, args=(key, flight, refresh, ttl, stale_ttl, True),
+                                     name='query-cache-refresh', daemon=True).start()
+                return entry.value, 'stale'
+            if entry is not None and entry.stale_until <= now:
+                self._remove(key)
+                self.metrics['expirations'] += 1
+            if flight is not None:
+                self.metrics['coalesced'] += 1
+            else:
+                self.metrics['misses'] += 1
+                flight = self._inflight[key] = _Flight()
+                leader = True
+        if leader:
+            self._fly(key, flight, loader, ttl, stale_ttl, version=version)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value, flight.status if leader else 'coalesced'
+
+    def _fly(self, key, flight, loader, ttl, stale_ttl, background=False, version=None):
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            if self.disk is not None and version is not None:
+                try:
+                    found = self.disk.get(key, version())
+                except DISK_ERRORS:
+                    self._disk_error()
+                    found = None
+                if found is not None:
+                    flight.value, tables, remaining = found
+                    flight.status = 'disk'
+                    self.set(key, flight.value, tables, min(ttl, remaining), None, stale_ttl)
+                    return
+            value, tables, generation, data_version = loader()
+            flight.value = value
+            if self.set(key, value, tables, ttl, generation, stale_ttl) and \
+                    self.disk is not None and data_version is not None:
+                try:
+                    self.disk.put(key, value, tables, data_version, ttl)
+                except DISK_ERRORS:
+                    self._disk_error()
+        except BaseException as e:
+            flight.error = e
+            if background:
+                self.metrics['refresh_errors'] += 1
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def _disk_error(self):
+        # The disk tier is best-effort: a locked, full or corrupt file costs a
+        # lookup or a store, never the caller's result.
+        with self._lock:
+            self.disk.metrics['errors'] += 1
+
+    def set(self, key, value, tables=(), ttl=None, generation=None, stale_ttl=0.0):
+        """Caches value unless one of its tables was invalidated after generation."""
+        db = key[0]
+        tables = frozenset(tables)
+        size = estimate_size(value)
+        with self._lock:
+            if generation is not None and any(
+                    self._invalidated.get((db, table), -1) > generation for table in tables):
+                return False
+            if size > self.max_bytes:
+                return False
+            if key in self._entries:
+                self._remove(key)
+            expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+            self._entries[key] = _Entry(value, size, expires, expires + stale_ttl, tables)
+            self._bytes += size
+            for table in tables:
+                self._by_table.setdefault((db, table), set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.metrics['evictions'] += 1
+            return True
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for table in entry.tables:
+            keys = self._by_table.get((key[0], table))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[(key[0], table)]
+
+    def invalidate(self, db, tables):
+        """Drops every entry of database db that read one of tables."""
+        with self._lock:
+            self._generation += 1
+            for table in tables:
+                self._invalidated[(db, table)] = self._generation
+                for key in list(self._by_table.get((db, table), ())):
+                    self._remove(key)
+                    self.metrics['invalidations'] += 1
+        if self.disk is not None:
+            self.disk.invalidate(db, tables)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.metrics, entries=len(self._entries), bytes=self._bytes)
+        if self.disk is not None:
+            stats['disk'] = self.disk.stats()
+        return stats
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry.expires > time.monotonic()
+
+    def __len__(self):
+        return len(self._entries)
+
+query_cache = QueryCache(disk=DiskCache(os.environ['QUERY_CACHE_DB']) if os.environ.get('QUERY_CACHE_DB') else None)
+
+@contextmanager
+def invalidating_writes(conn, cache=query_cache):
+    """Captures the tables written inside the block and, once it exits
+    cleanly (after the commit), invalidates them in cache."""
+    with capture_tables(conn) as access:
+        yield access
+    if access.writes:
+        cache.invalidate(database_path(conn), access.writes)
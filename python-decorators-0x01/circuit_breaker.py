@@ -0,0 +1,156 @@
+import functools
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from db_pool import PoolTimeout
+
+#### circuit breaker that fails fast while the database is down
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the function while the circuit is open."""
+
+# sqlite3 raises OperationalError for syntax errors and missing tables too,
+# so availability problems are told apart by their message.
+AVAILABILITY_ERRORS = ('locked', 'busy', 'unable to open', 'disk i/o')
+
+def is_database_failure(error):
+    """Default classifier: only availability errors (locked, busy, unreachable
+    database, disk I/O, exhausted pool) count against the circuit, not
+    application bugs such as a bad query or an IntegrityError."""
+    if isinstance(error, PoolTimeout):
+        return True
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error).lower()
+    return any(marker in message for marker in AVAILABILITY_ERRORS)
+
+class CircuitBreaker:
+    """Thread-safe closed/open/half-open circuit breaker.
+
+    Outcomes are counted in one-second buckets over the last window seconds.
+    Once at least min_calls were seen and failure_rate of them failed, the
+    circuit opens and every call raises CircuitOpenError. After
+    probe_interval seconds up to probes calls are let through (half-open):
+    a success closes the circuit, a failure opens it again.
+    """
+
+    def __init__(self, failure_rate=0.5, window=30, min_calls=10, probe_interval=5.0,
+                 probes=1, classifier=is_database_failure):
+        self.failure_rate = failure_rate
+        self.window = window
+        self.min_calls = min_calls
+        self.probe_interval = probe_interval
+        self.probes = probes
+        self.classifier = classifier
+        self.state = CLOSED
+        self._buckets = deque()
+        self._opened_at = 0.0
+        self._probing = 0
+        self._lock = threading.Lock()
+        self.metrics = {'calls': 0, 'successes': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+
+    def _counts(self, now):
+        while self._buckets and self._buckets[0][0] <= now - self.window:
+            self._buckets.popleft()
+        calls = sum(bucket[1] for bucket in self._buckets)
+        failures = sum(bucket[2] for bucket in self._buckets)
+        return calls, failures
+
+    def _record(self, now, failed):
+        second = int(now)
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0])
+        self._buckets[-1][1] += 1
+        self._buckets[-1][2] += failed
+
+    def _open(self, now):
+        self.state = OPEN
+        self._opened_at = now
+        self._buckets.clear()
+        self.metrics['opened'] += 1
+
+    def before_call(self):
+        """Raises CircuitOpenError, or admits the call (as a probe if half-open)."""
+        with self._lock:
+            self.metrics['calls'] += 1
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.probe_interval:
+                    self.metrics['rejected'] += 1
+                    raise CircuitOpenError(f"Circuit open, retry in {self.retry_after():.2f}s")
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self._probing >= self.probes:
+                    self.metrics['rejected'] += 1
+                    raise CircuitOpenError("Circuit half-open, probe in progress")
+                self._probing += 1
+                return True
+            return False
+
+    def after_call(self, probe, error=None):
+        failed = error is not None and self.classifier(error)
+        now = time.monotonic()
+        with self._lock:
+            self.metrics['failures' if failed else 'successes'] += 1
+            if probe:
+                self._probing -= 1
+                if self.state != HALF_OPEN:
+                    return
+                if failed:
+                    self._open(now)
+                else:
+                    self.state = CLOSED
+                    self._buckets.clear()
+                return
+            if self.state != CLOSED:
+                return
+            self._record(now, failed)
+            if failed:
+                calls, failures = self._counts(now)
+                if calls >= self.min_calls and failures >= self.failure_rate * calls:
+                    self._open(now)
+
+    def retry_after(self):
+        return max(0.0, self.probe_interval - (time.monotonic() - self._opened_at))
+
+    def call(self, func, *args, **kwargs):
+        probe = self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.after_call(probe, e)
+            raise
+        except BaseException:
+            if probe:
+                with self._lock:
+                    self._probing -= 1
+            raise
+        self.after_call(probe)
+        return result
+
+    def stats(self):
+        with self._lock:
+            calls, failures = self._counts(time.monotonic())
+            return dict(self.metrics, state=self.state, window_calls=calls, window_failures=failures)
+
+def circuit_breaker(breaker=None, **options):
+    """Decorator that runs the function through a CircuitBreaker.
+
+    Place it above with_db_connection so an open circuit skips the pool and
+    any retries entirely. Pass breaker to share one circuit between
+    functions; the breaker is exposed as wrapper.breaker.
+    """
+    def decorator(func):
+        circuit = breaker or CircuitBreaker(**options)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return circuit.call(func, *args, **kwargs)
+        wrapper.breaker = circuit
+        return wrapper
+    return decorator
@@ -0,0 +1,140 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+#### bounded, thread-safe pool of configured sqlite3 connections
+
+DEFAULT_PATH = 'users.db'
+
+DEFAULT_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('mmap_size', 256 * 1024 * 1024),
+    ('cache_size', -64 * 1024),
+)
+
+class PoolTimeout(Exception):
+    """Raised when no connection frees up within acquire_timeout."""
+
+class SQLitePool:
+    """Reuses sqlite3 connections to one database file across threads.
+
+    Connections are opened lazily up to max_size with check_same_thread=False,
+    get the PRAGMAs once when opened, and are rolled back on release so no
+    transaction leaks into the next borrower. wrap, if given, is applied to
+    every new connection, e.g. query_metrics.InstrumentedConnection.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_size=8, acquire_timeout=5.0, pragmas=DEFAULT_PRAGMAS,
+                 wrap=None):
+        self.path = os.path.abspath(path)
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.pragmas = pragmas
+        self.wrap = wrap
+        self.closed = False
+        self._idle = []
+        self._available = threading.Condition()
+        self._size = 0
+        self.metrics = {'opened': 0, 'checkouts': 0, 'hits': 0, 'waits': 0, 'discarded': 0}
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name} = {value}")
+        with self._available:
+            self.metrics['opened'] += 1
+        return self.wrap(conn) if self.wrap else conn
+
+    def acquire(self):
+        """Returns an idle connection, opens a new one, or waits for a release.
+
+        A waiting thread wakes on every release, including discards, so it
+        opens a connection as soon as there is room for one.
+        """
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._available:
+            self.metrics['checkouts'] += 1
+            waited = False
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No connection to {self.path} available after {self.acquire_timeout}s")
+                if not waited:
+                    self.metrics['waits'] += 1
+                    waited = True
+                self._available.wait(remaining)
+            if self._idle:
+                self.metrics['hits'] += 1
+                return self._idle.pop()
+            self._size += 1
+        try:
+            return self._open()
+        except Exception:
+            with self._available:
+                self._size -= 1
+                self._available.notify()
+            raise
+
+    def release(self, conn, discard=False):
+        """Returns conn to the pool, rolling back any open transaction."""
+        if not discard and not self.closed:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except sqlite3.Error:
+                discard = True
+        with self._available:
+            if not discard and not self.closed:
+                self._idle.append(conn)
+                self._available.notify()
+                return
+            self.metrics['discarded'] += 1
+            self._size -= 1
+            self._available.notify()
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._available:
+            stats = dict(self.metrics, size=self._size, idle=len(self._idle))
+        stats['hit_ratio'] = stats['hits'] / stats['checkouts'] if stats['checkouts'] else 0.0
+        return stats
+
+    def close(self):
+        """Closes the idle connections; borrowed ones are closed when released."""
+        with self._available:
+            self.closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self.release(conn, discard=True)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(path=None, **options):
+    """Returns this process's pool for path (USERS_DB or users.db by default).
+
+    options (max_size, wrap, ...) only apply when the pool is created, so
+    configure it before the first decorated call, e.g.
+    get_pool(wrap=InstrumentedConnection) to feed query_metrics.metrics.
+    """
+    path = os.path.abspath(path or os.environ.get('USERS_DB', DEFAULT_PATH))
+    key = (os.getpid(), path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.closed:
+            pool = _pools[key] = SQLitePool(path, **options)
+        return pool
@@ -0,0 +1,275 @@
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+#### per-query-shape latency, row and byte metrics for any DB-API connection
+#### sqlite3:  conn = InstrumentedConnection(sqlite3.connect('users.db'))
+#### pooled:   db_pool.get_pool(wrap=InstrumentedConnection)
+#### mysql:    pool.ConnectionPool(connect=lambda: InstrumentedConnection(seed.connect_to_prodev()))
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?|:\w+")
+_GROUP = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_REPEATED = re.compile(r"\(\?\+\)(?:\s*,\s*\(\?\+\))+")
+_SPACE = re.compile(r"\s+")
+
+def normalize_query(query):
+    """Reduces a query to its shape: literals and placeholders become ?,
+    value lists collapse and whitespace is squeezed."""
+    shape = _STRING.sub("?", query)
+    shape = _NUMBER.sub("?", shape)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _GROUP.sub("(?+)", shape)
+    shape = _REPEATED.sub("(?+), ...", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+def _estimate_bytes(row):
+    size = 0
+    for value in row.values() if isinstance(row, dict) else row:
+        if isinstance(value, (str, bytes, bytearray)):
+            size += len(value)
+        elif value is not None:
+            size += 8
+    return size
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of durations in microseconds.
+
+    Each power of two is split into sub_buckets linear buckets, so recorded
+    values keep a relative error below 1/sub_buckets at any magnitude.
+    """
+
+    def __init__(self, sub_buckets=16):
+        self.sub_buckets = sub_buckets
+        self._significant_bits = sub_buckets.bit_length()
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, micros):
+        shift = max(micros.bit_length() - self._significant_bits, 0)
+        return (micros >> shift) << shift
+
+    def record(self, seconds):
+        micros = max(int(seconds * 1_000_000), 0)
+        bucket = self._bucket(micros)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, q):
+        """Returns the q-th percentile (0-100) in seconds, to bucket precision."""
+        if not self.count:
+            return None
+        rank = q / 100 * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen > rank:
+                return bucket / 1_000_000
+        return self.max
+
+    def cumulative(self, bounds):
+        """Returns how many values fell at or below each bound (seconds)."""
+        buckets = sorted(self.counts.items())
+        return [sum(count for bucket, count in buckets if bucket / 1_000_000 <= bound)
+                for bound in bounds]
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'p999': self.percentile(99.9),
+        }
+
+class _ShapeStats:
+    def __init__(self):
+        self.execute = LatencyHistogram()
+        self.fetch = LatencyHistogram()
+        self.calls = 0
+        self.rows = 0
+        self.bytes = 0
+
+class QueryMetrics:
+    """Thread-safe registry of metrics grouped by normalized query shape."""
+
+    PROMETHEUS_BOUNDS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                         0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._shapes = {}
+
+    def _stats(self, shape):
+        stats = self._shapes.get(shape)
+        if stats is None:
+            stats = self._shapes[shape] = _ShapeStats()
+        return stats
+
+    def record_execute(self, shape, seconds):
+        with self._lock:
+            stats = self._stats(shape)
+            stats.calls += 1
+            stats.execute.record(seconds)
+
+    def record_fetch(self, shape, seconds, rows):
+        with self._lock:
+            stats = self._stats(shape)
+            stats.fetch.record(seconds)
+            stats.rows += len(rows)
+            stats.bytes += sum(_estimate_bytes(row) for row in rows)
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+
+    def snapshot(self):
+        """Returns {query shape: {calls, rows, bytes, execute, fetch}}."""
+        with self._lock:
+            return {
+                shape: {
+                    'calls': stats.calls,
+                    'rows': stats.rows,
+                    'bytes': stats.bytes,
+                    'execute': stats.execute.snapshot(),
+                    'fetch': stats.fetch.snapshot(),
+                }
+                for shape, stats in self._shapes.items()
+            }
+
+    def prometheus_text(self):
+        """Renders the metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP db_query_duration_seconds Time spent executing and fetching, by query shape.",
+            "# TYPE db_query_duration_seconds histogram",
+        ]
+        counters = []
+        with self._lock:
+            for shape, stats in sorted(self._shapes.items()):
+                label = _escape_label(shape)
+                for phase, histogram in (('execute', stats.execute), ('fetch', stats.fetch)):
+                    labels = f'query="{label}",phase="{phase}"'
+                    for bound, count in zip(self.PROMETHEUS_BOUNDS, histogram.cumulative(self.PROMETHEUS_BOUNDS)):
+                        lines.append(f'db_query_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f'db_query_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f'db_query_duration_seconds_sum{{{labels}}} {histogram.total}')
+                    lines.append(f'db_query_duration_seconds_count{{{labels}}} {histogram.count}')
+                counters.append((label, stats.rows, stats.bytes))
+        lines.append("# HELP db_query_rows_total Rows fetched, by query shape.")
+        lines.append("# TYPE db_query_rows_total counter")
+        lines.extend(f'db_query_rows_total{{query="{label}"}} {rows}' for label, rows, _ in counters)
+        lines.append("# HELP db_query_bytes_total Estimated bytes fetched, by query shape.")
+        lines.append("# TYPE db_query_bytes_total counter")
+        lines.extend(f'db_query_bytes_total{{query="{label}"}} {size}' for label, _, size in counters)
+        return "\n".join(lines) + "\n"
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+metrics = QueryMetrics()
+
+class InstrumentedCursor:
+    """Cursor proxy timing execute and fetch calls into a QueryMetrics registry."""
+
+    def __init__(self, cursor, registry):
+        self._cursor = cursor
+        self._registry = registry
+        self._shape = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def _execute(self, method, query, params):
+        self._shape = normalize_query(query)
+        start = time.perf_counter()
+        try:
+            method(query, params)
+        finally:
+            self._registry.record_execute(self._shape, time.perf_counter() - start)
+        return self
+
+    def execute(self, query, params=()):
+        return self._execute(self._cursor.execute, query, params)
+
+    def executemany(self, query, seq_params):
+        return self._execute(self._cursor.executemany, query, seq_params)
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        result = method(*args)
+        rows = result if isinstance(result, list) else [] if result is None else [result]
+        self._registry.record_fetch(self._shape, time.perf_counter() - start, rows)
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._fetch(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+class InstrumentedConnection:
+    """Connection proxy whose cursors report to a QueryMetrics registry."""
+
+    def __init__(self, connection, registry=metrics):
+        self._connection = connection
+        self._registry = registry
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        self._connection.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self._connection.__exit__(exc_type, exc_val, exc_tb)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs), self._registry)
+
+    def execute(self, query, params=()):
+        """sqlite3-style shortcut: runs query on a new instrumented cursor."""
+        return self.cursor().execute(query, params)
+
+def serve_metrics(port=9464, registry=metrics):
+    """Serves registry.prometheus_text() on http://127.0.0.1:port/metrics in a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
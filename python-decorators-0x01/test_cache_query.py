@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""Tests for cache_query keys, transactional invalidation and the disk tier."""
+
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from cache import DiskCache, QueryCache, query_cache
+
+_tmpdir = None
+cache_module = None
+transactional_module = None
+
+
+def setUpModule():
+    """Point the pool at a scratch users.db and import the task files."""
+    global _tmpdir, cache_module, transactional_module
+    _tmpdir = tempfile.TemporaryDirectory()
+    path = os.path.join(_tmpdir.name, 'users.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT)")
+    conn.executemany("INSERT INTO users (name, email) VALUES (?, ?)",
+                     [(f"user{i}", f"user{i}@example.com") for i in range(1, 6)])
+    conn.commit()
+    conn.close()
+    os.environ['USERS_DB'] = path
+    with contextlib.redirect_stdout(io.StringIO()):
+        cache_module = __import__('4-cache_query')
+        transactional_module = __import__('2-transactional')
+
+
+def tearDownModule():
+    """Remove the scratch database."""
+    os.environ.pop('USERS_DB', None)
+    _tmpdir.cleanup()
+
+
+class CacheQueryTestCase(unittest.TestCase):
+    """Base class silencing the decorator's prints and clearing the shared cache."""
+
+    def setUp(self):
+        """Start every test from an empty cache."""
+        query_cache.clear()
+        stdout = contextlib.redirect_stdout(io.StringIO())
+        stdout.__enter__()
+        self.addCleanup(stdout.__exit__, None, None, None)
+
+
+class TestCacheKeys(CacheQueryTestCase):
+    """Keys must include every bound argument, however it is passed."""
+
+    def setUp(self):
+        """Decorate a lookup taking the query and its params."""
+        super().setUp()
+        self.cache = QueryCache()
+
+        @cache_module.with_db_connection
+        @cache_module.cache_query(cache=self.cache)
+        def by_id(conn, query, params=()):
+            return conn.execute(query, params).fetchall()
+        self.by_id = by_id
+        self.query = "SELECT name FROM users WHERE id = ?"
+
+    def test_positional_params(self):
+        """Different positional params are cached separately."""
+        self.assertEqual(self.by_id(self.query, (1,)), [('user1',)])
+        self.assertEqual(self.by_id(self.query, (2,)), [('user2',)])
+        self.assertEqual(self.cache.stats()['entries'], 2)
+
+    def test_keyword_params(self):
+        """Different keyword params are cached separately."""
+        self.assertEqual(self.by_id(query=self.query, params=(1,)), [('user1',)])
+        self.assertEqual(self.by_id(query=self.query, params=(2,)), [('user2',)])
+
+    def test_positional_and_keyword_share_entry(self):
+        """The same arguments hit one entry whether passed by position or name."""
+        self.by_id(self.query, (3,))
+        self.assertEqual(self.by_id(query=self.query, params=(3,)), [('user3',)])
+        stats = self.cache.stats()
+        self.assertEqual((stats['misses'], stats['hits']), (1, 1))
+
+
+class TestInvalidation(CacheQueryTestCase):
+    """transactional writes evict cached results of the tables written."""
+
+    def test_write_evicts_dependent_entries(self):
+        """A committed update is visible on the next cached read."""
+        @cache_module.with_db_connection
+        @cache_module.cache_query
+        def email(conn, query, params=()):
+            return conn.execute(query, params).fetchone()[0]
+
+        @transactional_module.with_db_connection
+        @transactional_module.transactional
+        def set_email(conn, user_id, new_email):
+            conn.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
+
+        query = "SELECT email FROM users WHERE id = ?"
+        invalidations = query_cache.stats()['invalidations']
+        original = email(query, (4,))
+        self.assertEqual(email(query, (4,)), original)
+        set_email(4, 'changed@example.com')
+        self.assertEqual(email(query, (4,)), 'changed@example.com')
+        self.assertEqual(query_cache.stats()['invalidations'] - invalidations, 1)
+        set_email(4, original)
+
+    def test_rollback_keeps_entries(self):
+        """A failed transaction invalidates nothing."""
+        @cache_module.with_db_connection
+        @cache_module.cache_query
+        def count(conn, query):
+            return conn.execute(query).fetchone()[0]
+
+        @transactional_module.with_db_connection
+        @transactional_module.transactional
+        def failing_delete(conn):
+            conn.execute("DELETE FROM users")
+            raise ValueError("abort")
+
+        count("SELECT COUNT(*) FROM users")
+        invalidations = query_cache.stats()['invalidations']
+        with self.assertRaises(ValueError):
+            failing_delete()
+        self.assertEqual(count("SELECT COUNT(*) FROM users"), 5)
+        self.assertEqual(query_cache.stats()['invalidations'], invalidations)
+
+
+class TestDiskTier(CacheQueryTestCase):
+    """Results go to the shared disk tier only for file-backed databases."""
+
+    def setUp(self):
+        """Back a fresh cache with a scratch disk tier."""
+        super().setUp()
+        self.disk = DiskCache(os.path.join(_tmpdir.name, f"cache_{id(self)}.db"))
+        self.addCleanup(self.disk.close)
+        self.cache = QueryCache(disk=self.disk)
+
+    def test_file_database_written_to_disk(self):
+        """A pooled users.db result is stored and survives a cold memory tier."""
+        @cache_module.with_db_connection
+        @cache_module.cache_query(cache=self.cache)
+        def names(conn, query):
+            return conn.execute(query).fetchall()
+
+        rows = names("SELECT name FROM users ORDER BY id")
+        self.assertEqual(self.disk.stats()['entries'], 1)
+        self.cache.clear()
+        self.assertEqual(names("SELECT name FROM users ORDER BY id"), rows)
+        self.assertEqual(self.disk.stats()['hits'], 1)
+
+    def test_in_memory_database_not_written(self):
+        """In-memory results never reach the shared file."""
+        @cache_module.cache_query(cache=self.cache)
+        def one(conn, query):
+            return conn.execute(query).fetchall()
+
+        conn = sqlite3.connect(':memory:')
+        self.addCleanup(conn.close)
+        self.assertEqual(one(conn, "SELECT 1"), [(1,)])
+        self.assertEqual(self.disk.stats()['entries'], 0)
+
+    def test_disk_errors_do_not_fail_the_query(self):
+        """A locked file on get or put still returns the loaded rows."""
+        @cache_module.with_db_connection
+        @cache_module.cache_query(cache=self.cache)
+        def names(conn, query):
+            return conn.execute(query).fetchall()
+
+        locked = sqlite3.OperationalError("database is locked")
+        with mock.patch.object(self.disk, 'put', side_effect=locked):
+            rows = names("SELECT name FROM users ORDER BY id")
+        self.assertEqual(len(rows), 5)
+        self.cache.clear()
+        with mock.patch.object(self.disk, 'get', side_effect=locked):
+            self.assertEqual(names("SELECT name FROM users ORDER BY id"), rows)
+        self.assertEqual(self.disk.stats()['errors'], 2)
+
+    def test_corrupt_entry_falls_back_to_query(self):
+        """An entry that no longer unpickles is treated as a miss."""
+        @cache_module.with_db_connection
+        @cache_module.cache_query(cache=self.cache)
+        def names(conn, query):
+            return conn.execute(query).fetchall()
+
+        rows = names("SELECT name FROM users ORDER BY id")
+        self.disk._conn.execute("UPDATE entries SET value = x'00'")
+        self.cache.clear()
+        self.assertEqual(names("SELECT name FROM users ORDER BY id"), rows)
+        self.assertEqual(self.disk.stats()['errors'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
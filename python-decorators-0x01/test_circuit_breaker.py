@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Tests for the circuit breaker and its default failure classifier."""
+
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+from circuit_breaker import (CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError,
+                             circuit_breaker, is_database_failure)
+from db_pool import PoolTimeout
+
+
+class TestIsDatabaseFailure(unittest.TestCase):
+    """Only availability errors count against the circuit."""
+
+    def test_availability_errors(self):
+        """Locked, busy, unreachable and I/O errors and pool timeouts are failures."""
+        for error in (sqlite3.OperationalError("database is locked"),
+                      sqlite3.OperationalError("database table is locked: users"),
+                      sqlite3.OperationalError("database is busy"),
+                      sqlite3.OperationalError("unable to open database file"),
+                      sqlite3.OperationalError("disk I/O error"),
+                      PoolTimeout("No connection free after 5s")):
+            with self.subTest(error=error):
+                self.assertTrue(is_database_failure(error))
+
+    def test_application_errors(self):
+        """Bad queries, constraint violations and plain bugs are not."""
+        for error in (sqlite3.OperationalError('near "SELEC": syntax error'),
+                      sqlite3.OperationalError("no such table: userz"),
+                      sqlite3.IntegrityError("UNIQUE constraint failed: users.email"),
+                      sqlite3.ProgrammingError("Cannot operate on a closed cursor."),
+                      ValueError("bad input")):
+            with self.subTest(error=error):
+                self.assertFalse(is_database_failure(error))
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """The closed -> open -> half-open -> closed cycle, on a fake clock."""
+
+    def setUp(self):
+        """Drive time.monotonic from self.now."""
+        self.now = 1000.0
+        clock = patch('circuit_breaker.time.monotonic', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.breaker = CircuitBreaker(failure_rate=0.5, window=30, min_calls=4, probe_interval=5)
+
+    def _fail(self, message="database is locked"):
+        def locked():
+            raise sqlite3.OperationalError(message)
+        with self.assertRaises(sqlite3.OperationalError):
+            self.breaker.call(locked)
+
+    def _open_circuit(self):
+        for _ in range(4):
+            self._fail()
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_opens_after_failure_rate(self):
+        """Failures below min_calls keep it closed; reaching the rate opens it."""
+        self.breaker.call(lambda: 'ok')
+        self._fail()
+        self._fail()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self._fail()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.stats()['opened'], 1)
+
+    def test_open_rejects_without_calling(self):
+        """An open circuit raises CircuitOpenError and never runs the function."""
+        self._open_circuit()
+        calls = []
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(calls.append, 1)
+        self.assertEqual(calls, [])
+        self.assertEqual(self.breaker.stats()['rejected'], 1)
+
+    def test_probe_success_closes(self):
+        """After probe_interval one probe is admitted and its success closes the circuit."""
+        self._open_circuit()
+        self.now += 5
+        self.assertEqual(self.breaker.call(lambda: 'ok'), 'ok')
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.call(lambda: 'again'), 'again')
+
+    def test_probe_failure_reopens(self):
+        """A failed probe opens the circuit for another probe_interval."""
+        self._open_circuit()
+        self.now += 5
+        self._fail()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.stats()['opened'], 2)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(lambda: 'ok')
+
+    def test_half_open_limits_probes(self):
+        """While a probe is in flight further calls are rejected."""
+        self._open_circuit()
+        self.now += 5
+        self.assertTrue(self.breaker.before_call())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(lambda: 'ok')
+        self.breaker.after_call(True)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_application_errors_keep_circuit_closed(self):
+        """Syntax errors are re-raised but never open the circuit."""
+        for _ in range(10):
+            self._fail('near "SELEC": syntax error')
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.call(lambda: 'ok'), 'ok')
+
+    def test_old_failures_leave_window(self):
+        """Failures older than window no longer count."""
+        self.breaker.call(lambda: 'ok')
+        self._fail()
+        self._fail()
+        self.now += 31
+        self._fail()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+
+class TestCircuitBreakerDecorator(unittest.TestCase):
+    """The decorator exposes its breaker and can share one."""
+
+    def test_shared_breaker(self):
+        """Two functions given the same breaker trip it together."""
+        breaker = CircuitBreaker(min_calls=2, failure_rate=1.0)
+
+        @circuit_breaker(breaker)
+        def first():
+            raise sqlite3.OperationalError("database is locked")
+
+        @circuit_breaker(breaker)
+        def second():
+            return 'ok'
+
+        for _ in range(2):
+            with self.assertRaises(sqlite3.OperationalError):
+                first()
+        self.assertIs(second.breaker, breaker)
+        with self.assertRaises(CircuitOpenError):
+            second()
+
+
+if __name__ == '__main__':
+    unittest.main()
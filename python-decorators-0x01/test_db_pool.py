@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Tests for SQLitePool capacity, waiting and release."""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from db_pool import PoolTimeout, SQLitePool
+
+
+class TestSQLitePool(unittest.TestCase):
+    """A bounded pool hands out, reuses and frees connections."""
+
+    def setUp(self):
+        """Open a one-connection pool on a scratch database."""
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.pool = SQLitePool(os.path.join(tmpdir.name, 'users.db'), max_size=1, acquire_timeout=2.0)
+        self.addCleanup(self.pool.close)
+
+    def _acquire_in_thread(self):
+        result = {}
+
+        def acquire():
+            start = time.monotonic()
+            try:
+                result['conn'] = self.pool.acquire()
+            except PoolTimeout as e:
+                result['error'] = e
+            result['seconds'] = time.monotonic() - start
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        time.sleep(0.1)
+        return thread, result
+
+    def test_reuses_released_connection(self):
+        """A released connection is handed to the next borrower."""
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        self.assertIs(self.pool.acquire(), conn)
+        self.assertEqual(self.pool.stats()['hits'], 1)
+
+    def test_waiter_gets_released_connection(self):
+        """A blocked acquire returns once the connection is released."""
+        conn = self.pool.acquire()
+        thread, result = self._acquire_in_thread()
+        self.pool.release(conn)
+        thread.join()
+        self.assertIs(result['conn'], conn)
+        self.pool.release(conn)
+
+    def test_discard_wakes_waiter(self):
+        """A discard frees capacity and a blocked acquire opens a new connection at once."""
+        conn = self.pool.acquire()
+        thread, result = self._acquire_in_thread()
+        self.pool.release(conn, discard=True)
+        thread.join()
+        self.assertNotIn('error', result)
+        self.assertLess(result['seconds'], 1.0)
+        self.assertIsNot(result['conn'], conn)
+        self.pool.release(result['conn'])
+        stats = self.pool.stats()
+        self.assertEqual((stats['opened'], stats['discarded'], stats['waits']), (2, 1, 1))
+
+    def test_timeout(self):
+        """acquire raises PoolTimeout when nothing frees up in time."""
+        self.pool.acquire_timeout = 0.1
+        self.pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            self.pool.acquire()
+
+    def test_release_rolls_back(self):
+        """An open transaction is rolled back before the connection is reused."""
+        conn = self.pool.acquire()
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+        conn.execute("INSERT INTO t VALUES (1)")
+        self.pool.release(conn)
+        conn = self.pool.acquire()
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM t").fetchone(), (0,))
+        self.pool.release(conn)
+
+
+if __name__ == '__main__':
+    unittest.main()
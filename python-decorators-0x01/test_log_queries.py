@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Tests for log_queries and the background QueryLogger."""
+
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+_tmpdir = None
+_cwd = None
+log_module = None
+
+
+def setUpModule():
+    """Run the task file's demo against a scratch users.db."""
+    global _tmpdir, _cwd, log_module
+    _tmpdir = tempfile.TemporaryDirectory()
+    _cwd = os.getcwd()
+    os.chdir(_tmpdir.name)
+    conn = sqlite3.connect('users.db')
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.commit()
+    conn.close()
+    with contextlib.redirect_stdout(io.StringIO()):
+        log_module = __import__('0-log_queries')
+        log_module.query_logger.flush()
+
+
+def tearDownModule():
+    """Remove the scratch database."""
+    os.chdir(_cwd)
+    _tmpdir.cleanup()
+
+
+class TestQueryLogger(unittest.TestCase):
+    """Records are formatted off the caller's thread and never stop the writer."""
+
+    def setUp(self):
+        """Log every call of a (conn, query, params) function to a buffer."""
+        self.stream = io.StringIO()
+        self.logger = log_module.QueryLogger(flush_interval=0.02, stream=self.stream)
+
+        @log_module.log_queries(sample_rate=1.0, logger=self.logger)
+        def run(conn, query, params=()):
+            return conn.execute(query, params).fetchall()
+        self.run_query = run
+        self.conn = sqlite3.connect(':memory:')
+        self.addCleanup(self.conn.close)
+
+    def _lines(self):
+        self.logger.flush()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_positional_query_after_conn(self):
+        """The query is found after a leading connection argument."""
+        self.run_query(self.conn, "SELECT 'secret', ?", (1,))
+        [record] = self._lines()
+        self.assertEqual(record['query'], "SELECT ?, ?")
+        self.assertEqual(record['params'], ['?'])
+
+    def test_keyword_query(self):
+        """A query passed by name is logged too."""
+        self.run_query(self.conn, query="SELECT 1")
+        self.assertEqual(self._lines()[0]['query'], "SELECT ?")
+
+    def test_bad_record_does_not_kill_writer(self):
+        """A record that fails to format is counted and later records still flow."""
+        self.logger.submit((time.time(), object(), None, False, 0.0, 0))
+        time.sleep(0.1)
+        self.run_query(self.conn, "SELECT 1")
+        time.sleep(0.1)
+        self.assertTrue(self.logger._thread.is_alive())
+        stats = self.logger.stats()
+        self.assertEqual((stats['logged'], stats['failed'], stats['pending']), (1, 1, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Tests for query_metrics wired into the sqlite3 decorators through the pool."""
+
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from db_pool import SQLitePool, get_pool
+from query_metrics import InstrumentedConnection, QueryMetrics, metrics
+
+_tmpdir = None
+with_db_connection_module = None
+
+
+def setUpModule():
+    """Create an instrumented pool on a scratch users.db, then import the task file."""
+    global _tmpdir, with_db_connection_module
+    _tmpdir = tempfile.TemporaryDirectory()
+    path = os.path.join(_tmpdir.name, 'users.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT)")
+    conn.executemany("INSERT INTO users (name, email) VALUES (?, ?)",
+                     [(f"user{i}", f"user{i}@example.com") for i in range(1, 4)])
+    conn.commit()
+    conn.close()
+    os.environ['USERS_DB'] = path
+    get_pool(wrap=InstrumentedConnection)
+    with contextlib.redirect_stdout(io.StringIO()):
+        with_db_connection_module = __import__('1-with_db_connection')
+
+
+def tearDownModule():
+    """Close the pool and remove the scratch database."""
+    get_pool().close()
+    os.environ.pop('USERS_DB', None)
+    _tmpdir.cleanup()
+
+
+class TestPooledMetrics(unittest.TestCase):
+    """Queries run by decorated functions are recorded per shape."""
+
+    def setUp(self):
+        """Start from an empty registry."""
+        metrics.reset()
+
+    def test_get_user_by_id_recorded(self):
+        """get_user_by_id shows up with one call and one row per lookup."""
+        self.assertEqual(with_db_connection_module.get_user_by_id(user_id=2)[1], 'user2')
+        with_db_connection_module.get_user_by_id(user_id=3)
+        shape = metrics.snapshot()["SELECT * FROM users WHERE id = ?"]
+        self.assertEqual((shape['calls'], shape['rows']), (2, 2))
+        self.assertEqual(shape['execute']['count'], 2)
+
+    def test_pool_hands_out_wrapped_connections(self):
+        """Every pooled connection is the proxy, and release still rolls it back."""
+        pool = get_pool()
+        with pool.connection() as conn:
+            self.assertIsInstance(conn, InstrumentedConnection)
+            conn.execute("UPDATE users SET name = 'changed' WHERE id = 1")
+        with pool.connection() as conn:
+            self.assertEqual(conn.execute("SELECT name FROM users WHERE id = 1").fetchone(), ('user1',))
+
+    def test_custom_registry(self):
+        """wrap can bind the proxy to a registry of its own."""
+        registry = QueryMetrics()
+        pool = SQLitePool(os.environ['USERS_DB'], wrap=lambda conn: InstrumentedConnection(conn, registry))
+        self.addCleanup(pool.close)
+        with pool.connection() as conn:
+            conn.execute("SELECT 1").fetchall()
+        self.assertIn("SELECT ?", registry.snapshot())
+        self.assertNotIn("SELECT ?", metrics.snapshot())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Tests for retry_on_failure, its classifier and the shared retry budget."""
+
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+_tmpdir = None
+retry_module = None
+
+
+def setUpModule():
+    """Point the pool at a scratch users.db and import the task file."""
+    global _tmpdir, retry_module
+    _tmpdir = tempfile.TemporaryDirectory()
+    path = os.path.join(_tmpdir.name, 'users.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.commit()
+    conn.close()
+    os.environ['USERS_DB'] = path
+    with contextlib.redirect_stdout(io.StringIO()):
+        retry_module = __import__('3-retry_on_failure')
+
+
+def tearDownModule():
+    """Remove the scratch database."""
+    os.environ.pop('USERS_DB', None)
+    _tmpdir.cleanup()
+
+
+class RetryTestCase(unittest.TestCase):
+    """Base class patching out sleeps and jitter."""
+
+    def setUp(self):
+        """Record sleeps instead of taking them; uniform returns its upper bound."""
+        sleep = mock.patch.object(retry_module.time, 'sleep')
+        uniform = mock.patch.object(retry_module.random, 'uniform', side_effect=lambda low, high: high)
+        self.sleep = sleep.start()
+        self.uniform = uniform.start()
+        self.addCleanup(sleep.stop)
+        self.addCleanup(uniform.stop)
+
+    @staticmethod
+    def failing(errors, result='ok'):
+        """Returns a function raising each of errors in turn, then returning result."""
+        errors = list(errors)
+
+        def func():
+            if errors:
+                raise errors.pop(0)
+            return result
+        return func
+
+
+class TestIsTransient(unittest.TestCase):
+    """Only locked or busy databases are retried by default."""
+
+    def test_transient(self):
+        """Locked and busy OperationalErrors are transient."""
+        self.assertTrue(retry_module.is_transient(sqlite3.OperationalError("database is locked")))
+        self.assertTrue(retry_module.is_transient(sqlite3.OperationalError("database is busy")))
+
+    def test_not_transient(self):
+        """Syntax errors, missing tables and other exceptions are not."""
+        for error in (sqlite3.OperationalError('near "SELEC": syntax error'),
+                      sqlite3.OperationalError("no such table: userz"),
+                      sqlite3.IntegrityError("UNIQUE constraint failed"),
+                      ValueError("locked")):
+            with self.subTest(error=error):
+                self.assertFalse(retry_module.is_transient(error))
+
+
+class TestRetryOnFailure(RetryTestCase):
+    """Retries, classifier rejection, budget exhaustion and jitter bounds."""
+
+    def test_recovers_after_transient_errors(self):
+        """Two locked errors are retried and the third attempt succeeds."""
+        locked = sqlite3.OperationalError("database is locked")
+        func = retry_module.retry_on_failure(retries=3, delay=1, budget=None)(self.failing([locked, locked]))
+        self.assertEqual(func(), 'ok')
+        self.assertEqual(self.sleep.call_count, 2)
+        metrics = func.metrics
+        self.assertEqual((metrics['attempts'], metrics['retries'], metrics['recovered']), (3, 2, 1))
+
+    def test_classifier_rejection_raises_at_once(self):
+        """An error the classifier rejects is raised without sleeping."""
+        error = sqlite3.OperationalError('near "SELEC": syntax error')
+        func = retry_module.retry_on_failure(retries=5, budget=None)(self.failing([error]))
+        with self.assertRaises(sqlite3.OperationalError):
+            func()
+        self.sleep.assert_not_called()
+        self.assertEqual((func.metrics['attempts'], func.metrics['not_retryable']), (1, 1))
+
+    def test_gives_up_after_retries(self):
+        """The last attempt's error is raised once retries run out."""
+        locked = sqlite3.OperationalError("database is locked")
+        func = retry_module.retry_on_failure(retries=3, budget=None)(self.failing([locked] * 5))
+        with self.assertRaises(sqlite3.OperationalError):
+            func()
+        self.assertEqual((func.metrics['attempts'], func.metrics['gave_up']), (3, 1))
+
+    def test_budget_exhaustion_stops_retrying(self):
+        """With an empty bucket the error is raised instead of retried."""
+        budget = retry_module.RetryBudget(rate=0.0, capacity=1.0)
+        locked = sqlite3.OperationalError("database is locked")
+        func = retry_module.retry_on_failure(retries=5, budget=budget)(self.failing([locked] * 5))
+        with self.assertRaises(sqlite3.OperationalError):
+            func()
+        self.assertEqual(self.sleep.call_count, 1)
+        self.assertEqual((func.metrics['retries'], func.metrics['budget_exhausted']), (1, 1))
+
+    def test_jitter_bounds(self):
+        """Attempt n sleeps in [0, min(max_delay, delay * 2**n)]."""
+        locked = sqlite3.OperationalError("database is locked")
+        func = retry_module.retry_on_failure(retries=6, delay=1, max_delay=10, budget=None)(
+            self.failing([locked] * 5))
+        func()
+        bounds = [call.args for call in self.uniform.call_args_list]
+        self.assertEqual(bounds, [(0, 1), (0, 2), (0, 4), (0, 8), (0, 10)])
+        self.assertEqual([call.args[0] for call in self.sleep.call_args_list], [1, 2, 4, 8, 10])
+
+    def test_metrics_under_threads(self):
+        """Counters shared by many threads lose no increments."""
+        func = retry_module.retry_on_failure(budget=None)(lambda: None)
+        threads = [threading.Thread(target=lambda: [func() for _ in range(2000)]) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((func.metrics['calls'], func.metrics['attempts']), (16000, 16000))
+
+
+if __name__ == '__main__':
+    unittest.main()
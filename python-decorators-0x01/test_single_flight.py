@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Tests for cache_query single-flight loading and stale-while-revalidate."""
+
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from cache import QueryCache, query_cache
+
+_tmpdir = None
+cache_module = None
+
+
+def setUpModule():
+    """Point the pool at a scratch users.db and import the task file."""
+    global _tmpdir, cache_module
+    _tmpdir = tempfile.TemporaryDirectory()
+    path = os.path.join(_tmpdir.name, 'users.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT)")
+    conn.executemany("INSERT INTO users (name, email) VALUES (?, ?)",
+                     [(f"user{i}", f"user{i}@example.com") for i in range(1, 6)])
+    conn.commit()
+    conn.close()
+    os.environ['USERS_DB'] = path
+    with contextlib.redirect_stdout(io.StringIO()):
+        cache_module = __import__('4-cache_query')
+
+
+def tearDownModule():
+    """Remove the scratch database."""
+    os.environ.pop('USERS_DB', None)
+    _tmpdir.cleanup()
+
+
+class CacheQueryTestCase(unittest.TestCase):
+    """Base class silencing the decorator's prints and clearing the shared cache."""
+
+    def setUp(self):
+        """Start every test from an empty cache."""
+        query_cache.clear()
+        stdout = contextlib.redirect_stdout(io.StringIO())
+        stdout.__enter__()
+        self.addCleanup(stdout.__exit__, None, None, None)
+
+
+class TestSingleFlight(CacheQueryTestCase):
+    """Concurrent misses for one key run the query once."""
+
+    def _run_threads(self, target, args_list):
+        threads = [threading.Thread(target=target, args=args) for args in args_list]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_same_key_coalesced(self):
+        """Ten callers of one cold query share a single execution."""
+        cache = QueryCache()
+        calls = []
+
+        @cache_module.with_db_connection
+        @cache_module.cache_query(cache=cache)
+        def slow(conn, query):
+            calls.append(query)
+            time.sleep(0.2)
+            return conn.execute(query).fetchall()
+
+        results = []
+        self._run_threads(lambda: results.append(slow("SELECT id FROM users")), [()] * 10)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(result == results[0] for result in results))
+
+    def test_different_params_not_coalesced(self):
+        """Concurrent callers with different params each get their own rows."""
+        cache = QueryCache()
+
+        @cache_module.with_db_connection
+        @cache_module.cache_query(cache=cache)
+        def slow(conn, query, params):
+            time.sleep(0.1)
+            return conn.execute(query, params).fetchone()[0]
+
+        results = {}
+
+        def call(user_id):
+            results[user_id] = slow("SELECT name FROM users WHERE id = ?", (user_id,))
+
+        self._run_threads(call, [(user_id,) for user_id in range(1, 6)])
+        self.assertEqual(results, {user_id: f"user{user_id}" for user_id in range(1, 6)})
+
+
+class TestStaleWhileRevalidate(CacheQueryTestCase):
+    """Expired entries are served while one background refresh runs."""
+
+    def test_stale_served_then_refreshed(self):
+        """The stale value returns at once and the refresh replaces it."""
+        cache = QueryCache()
+        calls = []
+
+        @cache_module.with_db_connection
+        @cache_module.cache_query(cache=cache, ttl=0.3, stale_ttl=5)
+        def count(conn, query):
+            calls.append(threading.current_thread().name)
+            time.sleep(0.2)
+            return len(calls)
+
+        self.assertEqual(count("SELECT 1"), 1)
+        time.sleep(0.35)
+        start = time.perf_counter()
+        self.assertEqual(count("SELECT 1"), 1)
+        self.assertEqual(count("SELECT 1"), 1)
+        self.assertLess(time.perf_counter() - start, 0.1)
+        time.sleep(0.3)
+        self.assertEqual(count("SELECT 1"), 2)
+        self.assertEqual(calls[1], 'query-cache-refresh')
+        stats = cache.stats()
+        self.assertEqual((stats['stale_hits'], stats['refreshes']), (2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
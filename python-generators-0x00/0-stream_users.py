@@ -1,13 +1,36 @@
 import seed
+from records import USER_COLUMNS, row_builder
 
-def stream_users():
-    connection = seed.connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_data")
-    while True:
-        row = cursor.fetchone()
-        if row is None:
-            break
-        yield row
-    cursor.close()
-    connection.close()
+def stream_users(chunk_size=1000, pool=None, row_factory='dict'):
+    """Streams users one at a time through an unbuffered cursor.
+
+    Rows are pulled from the server chunk_size at a time with fetchmany, so
+    client memory stays flat no matter how large user_data is. The
+    connection comes from pool when one is given. row_factory picks the
+    row type: 'dict', or the more compact 'record' (records.UserRecord) or
+    'tuple' (records.UserRow), which all support user['age'].
+    """
+    build = row_builder(USER_COLUMNS, row_factory)
+    connection = pool.acquire() if pool else seed.connect_to_prodev()
+    cursor = connection.cursor(buffered=False)
+    exhausted = False
+    try:
+        cursor.execute(f"SELECT {', '.join(USER_COLUMNS)} FROM user_data")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                exhausted = True
+                break
+            for row in rows:
+                yield build(row)
+    finally:
+        if exhausted:
+            cursor.close()
+        # Closed early: unread rows are still on the wire, drop the socket
+        # instead of draining the rest of the table.
+        if pool:
+            pool.release(connection, discard=not exhausted)
+        elif exhausted:
+            connection.close()
+        else:
+            connection.shutdown()
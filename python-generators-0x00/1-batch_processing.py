@@ -1,29 +1,162 @@
+import csv
+from array import array
+from itertools import compress
+
 import seed
+from paging import PagingSession
+from partition import partitioned_scan
+from records import ROW_FACTORIES, row_builder
+from snapshot import read_snapshot, snapshot_users
 
-def stream_users_in_batches(batch_size):
-    """Yields users one by one from the DB, in batches."""
-    connection = seed.connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    
-    try:
-        cursor.execute("SELECT COUNT(*) as total FROM user_data")
-        total_rows = cursor.fetchone()['total']
-        
-        for offset in range(0, total_rows, batch_size):
-            cursor.execute("SELECT * FROM user_data LIMIT %s OFFSET %s", (batch_size, offset))
-            batch = cursor.fetchall()
-            for user in batch:
-                yield user
-                
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def stream_users_in_batches(batch_size, session=None, parallelism=None, pool=None,
+                            row_factory='dict', snapshot=None):
+    """Yields users one by one from the DB, in batches.
+
+    With parallelism set, the batches come from that many worker processes
+    each scanning a user_id range (see partition.partitioned_scan).
+    Otherwise the walk runs on session, or on a connection from pool.
+    row_factory is 'dict', 'record' or 'tuple' as in stream_users. With
+    snapshot set, users are read from that snapshot file instead.
+    """
+    if parallelism or snapshot:
+        factory = ROW_FACTORIES[row_factory]
+        if snapshot:
+            users = snapshot_users(snapshot, batch_size)
+        else:
+            users = (user for batch in partitioned_scan(parallelism, batch_size) for user in batch)
+        for user in users:
+            yield user if row_factory == 'dict' else factory(**user)
         return
-        
-    finally:
-        cursor.close()
-        connection.close()
+    if session is not None:
+        for columns, rows in session.raw_pages(batch_size):
+            build = row_builder(columns, row_factory)
+            for row in rows:
+                yield build(row)
+        return
+    with PagingSession(pool=pool) as session:
+        yield from stream_users_in_batches(batch_size, session=session, row_factory=row_factory)
 
-def batch_processing(batch_size):
+def batch_processing(batch_size, parallelism=None, snapshot=None):
     """Processes users over age 25."""
     print("Processing users in batches...")
-    for user in stream_users_in_batches(batch_size):
+    for user in stream_users_in_batches(batch_size, parallelism=parallelism, snapshot=snapshot):
         if user['age'] > 25:
-            print(user)
\ No newline at end of file
+            print(user)
+
+def count_users_over(min_age, pool=None, histogram=False):
+    """Counts users with age > min_age with an index range scan on age, or from
+    the loader-maintained age histogram in O(buckets) when histogram is set.
+
+    Like histogram_age_stats, a missing or empty histogram falls back to the
+    COUNT query."""
+    connection = pool.acquire() if pool else seed.connect_to_prodev()
+    cursor = connection.cursor()
+    try:
+        if histogram:
+            try:
+                counts = seed.load_age_histogram(connection)
+            except seed.DatabaseError as err:
+                print(f"Age histogram unavailable ({err}), counting from user_data")
+            else:
+                if counts:
+                    return sum(users for age, users in counts.items() if age > min_age)
+                print("Age histogram is empty, counting from user_data")
+        cursor.execute("SELECT COUNT(*) FROM user_data WHERE age > %s", (min_age,))
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        if pool:
+            pool.release(connection)
+        else:
+            connection.close()
+
+def _to_columns(columns, rows):
+    """Transposes row tuples into a {column: values} batch."""
+    values = dict(zip(columns, zip(*rows)))
+    if np is not None:
+        batch = {name: np.array(column, dtype=object) for name, column in values.items()}
+        batch['age'] = np.array(values['age'], dtype=np.float64)
+    else:
+        batch = {name: list(column) for name, column in values.items()}
+        batch['age'] = array('d', map(float, values['age']))
+    return batch
+
+def _arrow_columns(batch):
+    """Converts a snapshot RecordBatch into a {column: values} batch."""
+    if np is not None:
+        return {name: column.to_numpy(zero_copy_only=False)
+                for name, column in zip(batch.schema.names, batch.columns)}
+    batch = batch.to_pydict()
+    batch['age'] = array('d', batch['age'])
+    return batch
+
+def stream_column_batches(batch_size, session=None, snapshot=None):
+    """Yields users as column batches instead of one dict per row.
+
+    Each batch maps column name to values: NumPy arrays (float64 ages) when
+    NumPy is installed, otherwise lists and an array('d') of ages. With
+    snapshot set, the batches come from that snapshot file.
+    """
+    if snapshot:
+        for batch in read_snapshot(snapshot, batch_size=batch_size):
+            yield _arrow_columns(batch)
+        return
+    if session is not None:
+        for columns, rows in session.raw_pages(batch_size):
+            yield _to_columns(columns, rows)
+        return
+    with PagingSession() as session:
+        for columns, rows in session.raw_pages(batch_size):
+            yield _to_columns(columns, rows)
+
+def age_above(min_age):
+    """Returns a predicate building the mask of rows with age > min_age."""
+    def predicate(batch):
+        if np is not None:
+            return batch['age'] > min_age
+        return [age > min_age for age in batch['age']]
+    return predicate
+
+def filter_batch(batch, mask):
+    """Keeps the rows of a column batch selected by a boolean mask."""
+    if np is not None:
+        return {name: column[mask] for name, column in batch.items()}
+    selected = {}
+    for name, column in batch.items():
+        kept = compress(column, mask)
+        selected[name] = array(column.typecode, kept) if isinstance(column, array) else list(kept)
+    return selected
+
+def print_sink(batch):
+    """Prints each selected row, like batch_processing does."""
+    names = list(batch)
+    for values in zip(*batch.values()):
+        print(dict(zip(names, values)))
+
+def file_sink(file):
+    """Returns a sink appending selected rows as CSV to an open text file."""
+    writer = csv.writer(file)
+    def sink(batch):
+        writer.writerows(zip(*batch.values()))
+    return sink
+
+def queue_sink(queue):
+    """Returns a sink putting each selected column batch on a queue."""
+    return queue.put
+
+def batch_processing_columnar(batch_size, predicate=None, sink=print_sink, snapshot=None):
+    """Filters column batches with a vectorized mask and hands matches to sink.
+
+    predicate maps a batch to a boolean mask (age_above(25) by default); sink
+    is any callable taking the filtered batch, e.g. file_sink or queue_sink.
+    """
+    predicate = predicate or age_above(25)
+    for batch in stream_column_batches(batch_size, snapshot=snapshot):
+        selected = filter_batch(batch, predicate(batch))
+        if len(selected['age']):
+            sink(selected)
@@ -1,19 +1,44 @@
 import seed
+from paging import KEYSET_COLUMNS, PagingSession, PrefetchIterator, encode_cursor, decode_cursor, keyset_query
 
-def paginate_users(page_size, offset):
-    connection = seed.connect_to_prodev()
+def paginate_users(page_size, offset, pool=None):
+    connection = pool.acquire() if pool else seed.connect_to_prodev()
     cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
+    cursor.execute("SELECT * FROM user_data LIMIT %s OFFSET %s", (page_size, offset))
     rows = cursor.fetchall()
     cursor.close()
-    connection.close()
+    if pool:
+        pool.release(connection)
+    else:
+        connection.close()
     return rows
 
-def lazy_pagination(page_size):
-    offset = 0
-    while True:
-        page = paginate_users(page_size, offset)
-        if not page:
-            break
-        yield page
-        offset += page_size
+def paginate_users_after(page_size, key='user_id', after=None, pool=None):
+    """Fetches one page by seeking past the cursor token instead of scanning an OFFSET."""
+    with PagingSession(pool=pool) as session:
+        return session.fetch_page(*keyset_query(page_size, key, after))
+
+def lazy_pagination(page_size, key='user_id', cursor=None, session=None, pool=None, prefetch=0,
+                    on_stats=None):
+    """Lazily yields pages ordered by key, resuming after the cursor token if given.
+
+    Pass encode_cursor(page[-1], key) back as cursor to continue where a
+    previous walk stopped. All pages share one PagingSession, on a pooled
+    connection if pool is given; pass your own session to read its per-page
+    timings afterwards. With prefetch > 0 up to that many pages are fetched
+    ahead on a background thread; on_stats, if given, is then called with
+    the PrefetchIterator stall statistics once the walk ends or is closed.
+    """
+    if prefetch:
+        with PrefetchIterator(lazy_pagination(page_size, key, cursor, session, pool), prefetch) as pages:
+            try:
+                yield from pages
+            finally:
+                if on_stats is not None:
+                    on_stats(pages.stats())
+        return
+    if session is not None:
+        yield from session.pages(page_size, key, cursor)
+        return
+    with PagingSession(pool=pool) as session:
+        yield from session.pages(page_size, key, cursor)
@@ -1,27 +1,200 @@
+import math
+
 import seed
+from partition import partitioned_scan
+from snapshot import snapshot_ages
 
-def stream_user_ages():
+def stream_user_ages(parallelism=None, pool=None, snapshot=None):
     """Generator to stream user ages one at a time"""
-    connection = seed.connect_to_prodev()
+    if snapshot:
+        yield from snapshot_ages(snapshot)
+        return
+    if parallelism:
+        for batch in partitioned_scan(parallelism, columns=('age',)):
+            for row in batch:
+                yield float(row['age'])
+        return
+    connection = pool.acquire() if pool else seed.connect_to_prodev()
+    cursor = connection.cursor()
+    exhausted = False
+    try:
+        cursor.execute("SELECT age FROM user_data")
+        while True:
+            row = cursor.fetchone()
+            if row is None:
+                exhausted = True
+                break
+            yield float(row[0])
+    finally:
+        if exhausted:
+            cursor.close()
+        if pool:
+            pool.release(connection, discard=not exhausted)
+        elif exhausted:
+            connection.close()
+        else:
+            connection.shutdown()
+
+class AgeAccumulator:
+    """Single pass age statistics: Welford mean/variance plus a histogram sketch.
+
+    The sketch counts values in buckets of width resolution, which is exact
+    for whole-year ages and can be merged with another accumulator's.
+    """
+
+    def __init__(self, resolution=1.0):
+        self.resolution = resolution
+        self.count = 0
+        self.mean = 0.0
+        self.min = None
+        self.max = None
+        self._m2 = 0.0
+        self.buckets = {}
+
+    @classmethod
+    def from_counts(cls, counts, resolution=1.0):
+        """Builds the statistics of a {value: count} histogram in O(buckets)."""
+        accumulator = cls(resolution)
+        for value, count in sorted(counts.items()):
+            if not count:
+                continue
+            other = cls(resolution)
+            other.count = count
+            other.mean = value
+            other.min = other.max = value
+            other.buckets = {math.floor(value / resolution): count}
+            accumulator.merge(other)
+        return accumulator
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        bucket = math.floor(value / self.resolution)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def merge(self, other):
+        """Folds another accumulator (e.g. from a parallel scan) into this one."""
+        if other.resolution != self.resolution:
+            raise ValueError("Cannot merge sketches with different resolutions")
+        if not other.count:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self._m2 += other._m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        return self
+
+    def quantile(self, q):
+        """Returns the lower edge of the bucket holding the q-th quantile (0 <= q <= 1)."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                return bucket * self.resolution
+        return self.max
+
+    def result(self, percentiles=()):
+        return {
+            'count': self.count,
+            'mean': self.mean if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'stddev': math.sqrt(self._m2 / self.count) if self.count else None,
+            'percentiles': {p: self.quantile(p / 100) for p in percentiles},
+        }
+
+def pushdown_age_stats(pool=None):
+    """Computes count/mean/min/max/stddev of ages in one aggregate query."""
+    connection = pool.acquire() if pool else seed.connect_to_prodev()
     cursor = connection.cursor()
-    cursor.execute("SELECT age FROM user_data")
-    while True:
-        row = cursor.fetchone()
-        if row is None:
-            break
-        yield float(row[0])
-    cursor.close()
-    connection.close()
-
-def compute_average_age():
-    """Compute average age using streaming generator"""
-    total_age = 0
-    count = 0
-    for age in stream_user_ages():
-        total_age += age
-        count += 1
-    if count > 0:
-        average_age = total_age / count
+    try:
+        cursor.execute(
+            "SELECT COUNT(age), AVG(age), MIN(age), MAX(age), AVG(age * age) FROM user_data"
+        )
+        count, mean, low, high, mean_square = cursor.fetchone()
+    finally:
+        cursor.close()
+        if pool:
+            pool.release(connection)
+        else:
+            connection.close()
+    if not count:
+        return AgeAccumulator().result()
+    mean = float(mean)
+    return {
+        'count': count,
+        'mean': mean,
+        'min': float(low),
+        'max': float(high),
+        'stddev': math.sqrt(max(float(mean_square) - mean * mean, 0.0)),
+        'percentiles': {},
+    }
+
+def histogram_age_stats(percentiles=(), pool=None):
+    """Answers age statistics from the precomputed user_age_histogram table.
+
+    Returns None when the histogram has not been built yet.
+    """
+    connection = pool.acquire() if pool else seed.connect_to_prodev()
+    try:
+        histogram = seed.load_age_histogram(connection)
+    finally:
+        if pool:
+            pool.release(connection)
+        else:
+            connection.close()
+    if not histogram:
+        return None
+    return AgeAccumulator.from_counts(histogram).result(percentiles)
+
+def aggregate_ages(percentiles=(), pushdown=True, parallelism=None, pool=None, snapshot=None,
+                   histogram=False):
+    """Returns age statistics, pushing the aggregation down to the database when possible.
+
+    With histogram=True the user_age_histogram summary is tried first. It is
+    only rebuilt by the seed/ingest loaders, so opt in only when user_data is
+    written through them (or after seed.refresh_age_histogram). Next, one
+    aggregate query computes everything but percentiles. Otherwise (or if the
+    query fails) the ages are streamed once through AgeAccumulator, spread
+    over parallelism worker processes if given. With snapshot set, the ages
+    are read from that snapshot file instead of the database.
+    """
+    if pushdown and not snapshot:
+        if histogram:
+            try:
+                stats = histogram_age_stats(percentiles, pool)
+                if stats is not None:
+                    return stats
+            except seed.DatabaseError as err:
+                print(f"Age histogram unavailable ({err}), using the aggregate query")
+        if not percentiles:
+            try:
+                return pushdown_age_stats(pool)
+            except seed.DatabaseError as err:
+                print(f"Aggregate push-down failed ({err}), streaming ages instead")
+    accumulator = AgeAccumulator()
+    for age in stream_user_ages(parallelism, pool, snapshot):
+        accumulator.add(age)
+    return accumulator.result(percentiles)
+
+def compute_average_age(parallelism=None, snapshot=None, histogram=False):
+    """Compute average age of users, scanning in parallel when parallelism is set
+    or reading a snapshot file instead of the database when snapshot is set"""
+    average_age = aggregate_ages(pushdown=not parallelism, parallelism=parallelism,
+                                 snapshot=snapshot, histogram=histogram)['mean']
+    if average_age is not None:
         print(f"Average age of users: {average_age}")
     else:
         print("No users found.")
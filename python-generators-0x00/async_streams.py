@@ -0,0 +1,135 @@
+import asyncio
+import os
+from contextlib import aclosing
+
+import seed
+from paging import encode_cursor, keyset_query
+
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+def _is_sqlite(connection):
+    return aiosqlite is not None and isinstance(connection, aiosqlite.Connection)
+
+async def async_connect():
+    """Opens an async connection to ALX_prodev, or to the PRODEV_SQLITE stand-in."""
+    sqlite_path = os.environ.get('PRODEV_SQLITE')
+    if sqlite_path:
+        if aiosqlite is None:
+            raise ImportError("aiosqlite is required for the async SQLite stand-in")
+        return await aiosqlite.connect(sqlite_path)
+    if aiomysql is None:
+        raise ImportError("aiomysql is required for the async streaming API")
+    return await aiomysql.connect(host='localhost', user='root', password='', db='ALX_prodev')
+
+async def _close(connection):
+    if _is_sqlite(connection):
+        await connection.close()
+    else:
+        connection.close()
+
+async def _cancel(task):
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+async def _fetch_page(connection, query, params):
+    """Runs a page query and returns its rows as dicts."""
+    if _is_sqlite(connection):
+        async with connection.execute(seed.to_sqlite(query), params) as cursor:
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in await cursor.fetchall()]
+    async with connection.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(query, params)
+        return list(await cursor.fetchall())
+
+async def _stream_chunks(connection, query, params, size):
+    """Yields lists of row dicts from one unbuffered query, fetching the
+    next chunk while the caller works on the current one."""
+    if _is_sqlite(connection):
+        cursor = await connection.execute(seed.to_sqlite(query), params)
+        columns = [column[0] for column in cursor.description]
+
+        def to_dicts(rows):
+            return [dict(zip(columns, row)) for row in rows]
+    else:
+        cursor = await connection.cursor(aiomysql.SSDictCursor)
+        await cursor.execute(query, params)
+        to_dicts = list
+    pending = asyncio.ensure_future(cursor.fetchmany(size))
+    try:
+        while True:
+            rows = await pending
+            if not rows:
+                break
+            pending = asyncio.ensure_future(cursor.fetchmany(size))
+            yield to_dicts(rows)
+    finally:
+        # An early exit leaves unread rows; the caller closes the connection
+        # rather than draining them through cursor.close().
+        await _cancel(pending)
+
+async def async_stream_users(chunk_size=1000):
+    """Async counterpart of stream_users: yields users one at a time."""
+    connection = await async_connect()
+    try:
+        chunks = _stream_chunks(connection, "SELECT * FROM user_data", (), chunk_size)
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                for row in chunk:
+                    yield row
+    finally:
+        await _close(connection)
+
+async def async_lazy_pagination(page_size, key='user_id', cursor=None):
+    """Async counterpart of lazy_pagination.
+
+    Page N+1 is requested as soon as page N is handed out, so the query runs
+    while the consumer processes the current page. Cancelling the consumer,
+    or closing the generator (wrap it in contextlib.aclosing when breaking
+    out early), cancels the read-ahead and closes the connection.
+    """
+    connection = await async_connect()
+    pending = None
+    try:
+        page = await _fetch_page(connection, *keyset_query(page_size, key, cursor))
+        while page:
+            after = encode_cursor(page[-1], key)
+            pending = asyncio.ensure_future(
+                _fetch_page(connection, *keyset_query(page_size, key, after))
+            )
+            yield page
+            page = await pending
+    finally:
+        await _cancel(pending)
+        await _close(connection)
+
+async def async_stream_users_in_batches(batch_size):
+    """Async counterpart of stream_users_in_batches: yields users one by one."""
+    pages = async_lazy_pagination(batch_size)
+    async with aclosing(pages):
+        async for batch in pages:
+            for user in batch:
+                yield user
+
+async def async_stream_user_ages(chunk_size=1000):
+    """Async counterpart of stream_user_ages."""
+    connection = await async_connect()
+    try:
+        chunks = _stream_chunks(connection, "SELECT age FROM user_data", (), chunk_size)
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                for row in chunk:
+                    yield float(row['age'])
+    finally:
+        await _close(connection)
@@ -0,0 +1,256 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import seed
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+CSV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'user_data.csv')
+
+def sqlite_standin(directory):
+    """Returns a fresh SQLite stand-in with an empty user_data table."""
+    connection = seed.connect_sqlite(os.path.join(directory, f"bench_{time.monotonic_ns()}.db"))
+    seed.create_table(connection)
+    return connection
+
+def scaled_csv(directory, repeat, csv_file=CSV_FILE):
+    """Writes a copy of the CSV with its data rows repeated and returns its path."""
+    with open(csv_file, newline='') as file:
+        header, *rows = [line + '\n' for line in file.read().splitlines()]
+    path = os.path.join(directory, f"user_data_x{repeat}.csv")
+    with open(path, 'w', newline='') as file:
+        file.write(header)
+        for _ in range(repeat):
+            file.writelines(rows)
+    return path
+
+def timed(func, *args, **kwargs):
+    """Runs func and returns (result, elapsed seconds)."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def bench_insert(connect, csv_file=CSV_FILE, chunk_size=1000):
+    """Compares the per-row insert_data loop with insert_data_bulk."""
+    connection = connect()
+    _, per_row = timed(seed.insert_data, connection, csv_file)
+    connection.close()
+
+    connection = connect()
+    stats, bulk = timed(seed.insert_data_bulk, connection, csv_file, chunk_size)
+    connection.close()
+
+    print(f"insert_data:      {per_row:.3f}s ({stats['rows'] / per_row:.0f} rows/sec)")
+    print(f"insert_data_bulk: {bulk:.3f}s ({stats['rows'] / bulk:.0f} rows/sec)")
+    print(f"speedup:          {per_row / bulk:.1f}x")
+
+def bench_ages(connect, csv_file=CSV_FILE, repeat=1):
+    """Compares the age histogram, the aggregate query and the streaming accumulator."""
+    connection = connect()
+    for _ in range(repeat):
+        seed.insert_data_bulk(connection, csv_file)
+    connection.close()
+    stream_ages = __import__('4-stream_ages')
+
+    paths = [
+        ('histogram', stream_ages.histogram_age_stats),
+        ('aggregate', stream_ages.pushdown_age_stats),
+        ('streaming', lambda: stream_ages.aggregate_ages(pushdown=False)),
+    ]
+    for name, aggregate in paths:
+        stats, elapsed = timed(aggregate)
+        print(f"{name}: {elapsed:.4f}s mean={stats['mean']:.3f} stddev={stats['stddev']:.3f}")
+
+def bench_ingest(connect, csv_file=CSV_FILE, writers=(1, 2, 4)):
+    """Compares insert_data_bulk with the parallel pipeline at several writer counts."""
+    ingest = __import__('ingest')
+    connection = connect()
+    stats = seed.insert_data_bulk(connection, csv_file)
+    connection.close()
+    print(f"insert_data_bulk:               {stats['rows_per_sec']:.0f} rows/sec")
+    for count in writers:
+        # Fresh empty table per run; the writers reach it through connect_to_prodev.
+        connect().close()
+        # Random ids, like insert_data_bulk, so the repeated CSV rows are all inserted.
+        stats = ingest.insert_data_parallel(csv_file, writers=count, deterministic_ids=False)
+        print(f"insert_data_parallel writers={count}: {stats['rows_per_sec']:.0f} rows/sec")
+
+def bench_rows(connect, csv_file=CSV_FILE, repeat=1):
+    """Compares memory and throughput of the dict, record and tuple row factories."""
+    connection = connect()
+    for _ in range(repeat):
+        seed.insert_data_bulk(connection, csv_file)
+    connection.close()
+    stream_users = __import__('0-stream_users')
+
+    for row_factory in ('dict', 'record', 'tuple'):
+        tracemalloc.start()
+        rows, elapsed = timed(list, stream_users.stream_users(row_factory=row_factory))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{row_factory:>6}: {len(rows) / elapsed:.0f} rows/sec, "
+              f"{peak / len(rows):.0f} bytes/row peak while holding {len(rows)} rows")
+
+def seed_rows(connect, rows, csv_file=CSV_FILE, chunk_size=10000):
+    """Fills a fresh user_data with rows users cycled from the CSV template.
+
+    Emails get a numeric prefix so every generated user is distinct.
+    """
+    with open(csv_file, newline='') as file:
+        template = [(row['name'], row['email'], row['age']) for row in csv.DictReader(file)]
+    connection = connect()
+    cursor = connection.cursor()
+    users = ((name, f"{number}.{email}", age)
+             for number, (name, email, age) in enumerate(itertools.islice(itertools.cycle(template), rows)))
+    while True:
+        chunk = list(itertools.islice(users, chunk_size))
+        if not chunk:
+            break
+        seed.insert_rows(cursor, chunk)
+        connection.commit()
+    seed.refresh_age_histogram(cursor)
+    connection.commit()
+    cursor.close()
+    connection.close()
+
+def _streaming_function(name):
+    """Returns (iterator, rows per item) for one of the benchmarked generators."""
+    if name == 'stream_users':
+        return __import__('0-stream_users').stream_users(), False
+    if name == 'stream_users_in_batches':
+        return __import__('1-batch_processing').stream_users_in_batches(1000), False
+    if name == 'lazy_pagination':
+        return __import__('2-lazy_paginate').lazy_pagination(1000), True
+    if name == 'stream_user_ages':
+        return __import__('4-stream_ages').stream_user_ages(), False
+    raise ValueError(f"Unknown streaming function {name!r}")
+
+STREAMING_FUNCTIONS = ('stream_users', 'stream_users_in_batches', 'lazy_pagination', 'stream_user_ages')
+
+def _peak_rss():
+    """Returns this process's peak resident set size in bytes, if known."""
+    # VmHWM starts afresh at exec; ru_maxrss would include the parent's peak.
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux and bytes on macOS.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+def _measure_streaming(name, results):
+    """Child process: drains one generator and reports its figures on results."""
+    connections = 0
+    dial = seed.connect_to_prodev
+    def counting_connect():
+        nonlocal connections
+        connections += 1
+        return dial()
+    seed.connect_to_prodev = counting_connect
+
+    rows = 0
+    first_row = None
+    start = time.perf_counter()
+    iterator, paged = _streaming_function(name)
+    for item in iterator:
+        if first_row is None:
+            first_row = time.perf_counter() - start
+        rows += len(item) if paged else 1
+    elapsed = time.perf_counter() - start
+    results.put({
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed else 0.0,
+        'time_to_first_row': first_row,
+        'peak_rss_bytes': _peak_rss(),
+        'connections': connections,
+    })
+
+def bench_streaming(connect, scales, functions=STREAMING_FUNCTIONS, csv_file=CSV_FILE, output=None):
+    """Measures each streaming generator at each scale and emits JSON lines.
+
+    Every measurement runs in a freshly spawned process so peak RSS and
+    connection counts belong to that generator alone.
+    """
+    context = multiprocessing.get_context('spawn')
+    for scale in scales:
+        seed_rows(connect, scale, csv_file)
+        for name in functions:
+            results = context.Queue()
+            worker = context.Process(target=_measure_streaming, args=(name, results))
+            worker.start()
+            result = results.get()
+            worker.join()
+            result.update({
+                'function': name,
+                'scale': scale,
+                'backend': 'sqlite' if os.environ.get('PRODEV_SQLITE') else 'mysql',
+                'python': platform.python_version(),
+            })
+            line = json.dumps(result)
+            print(line)
+            if output:
+                with open(output, 'a') as file:
+                    file.write(line + '\n')
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for python-generators-0x00")
+    parser.add_argument('suite', nargs='?', default='insert', choices=('insert', 'ages', 'ingest', 'rows', 'streaming'))
+    parser.add_argument('--mysql', action='store_true', help="run against ALX_prodev (clears user_data) instead of SQLite")
+    parser.add_argument('--csv', default=CSV_FILE)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=100, help="times the CSV is repeated for the ages, ingest and rows suites")
+    parser.add_argument('--scales', default='1000,100000',
+                        help="comma separated row counts for the streaming suite, e.g. 1000,100000,10000000")
+    parser.add_argument('--functions', default=','.join(STREAMING_FUNCTIONS),
+                        help="comma separated generators for the streaming suite")
+    parser.add_argument('--output', help="also append streaming results as JSON lines to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.mysql:
+            def connect():
+                connection = seed.connect_to_prodev()
+                seed.create_table(connection)
+                cursor = connection.cursor()
+                cursor.execute("DELETE FROM user_data")
+                cursor.execute("DELETE FROM user_data_changes")
+                connection.commit()
+                cursor.close()
+                return connection
+        else:
+            def connect():
+                connection = sqlite_standin(directory)
+                os.environ['PRODEV_SQLITE'] = connection.path
+                return connection
+        if args.suite == 'insert':
+            bench_insert(connect, args.csv, args.chunk_size)
+        elif args.suite == 'ages':
+            bench_ages(connect, args.csv, args.repeat)
+        elif args.suite == 'rows':
+            bench_rows(connect, args.csv, args.repeat)
+        elif args.suite == 'streaming':
+            scales = [int(scale) for scale in args.scales.split(',')]
+            functions = args.functions.split(',')
+            bench_streaming(connect, scales, functions, args.csv, args.output)
+        else:
+            bench_ingest(connect, scaled_csv(directory, args.repeat, args.csv))
+
+if __name__ == "__main__":
+    main()
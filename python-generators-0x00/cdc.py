@@ -0,0 +1,53 @@
+import seed
+
+def load_watermark(cursor, consumer):
+    """Returns the last changelog seq consumer has processed (0 if new)."""
+    cursor.execute("INSERT IGNORE INTO cdc_watermarks (consumer, seq) VALUES (%s, 0)", (consumer,))
+    cursor.execute("SELECT seq FROM cdc_watermarks WHERE consumer = %s", (consumer,))
+    return cursor.fetchone()[0]
+
+def save_watermark(cursor, consumer, seq):
+    cursor.execute("UPDATE cdc_watermarks SET seq = %s WHERE consumer = %s", (seq, consumer))
+
+def stream_changes(consumer='default', batch_size=1000, pool=None):
+    """Yields only the users inserted or updated since consumer's watermark.
+
+    Changes are read from the user_data_changes changelog in seq order. The
+    watermark is persisted after the consumer has taken a whole batch, so a
+    crashed run resumes at most one batch back (at-least-once delivery).
+    Changelog entries committed out of seq order by concurrent loaders can
+    be skipped, so run consumers after loads have finished.
+    """
+    connection = pool.acquire() if pool else seed.connect_to_prodev()
+    cursor = connection.cursor()
+    try:
+        watermark = load_watermark(cursor, consumer)
+        connection.commit()
+        while True:
+            cursor.execute("""
+                SELECT c.seq, u.user_id, u.name, u.email, u.age
+                FROM user_data_changes c
+                LEFT JOIN user_data u ON u.user_id = c.user_id
+                WHERE c.seq > %s
+                ORDER BY c.seq
+                LIMIT %s
+            """, (watermark, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            seen = set()
+            for seq, user_id, name, email, age in rows:
+                # Users logged more than once in a batch, or since deleted, are skipped.
+                if user_id is None or user_id in seen:
+                    continue
+                seen.add(user_id)
+                yield {'user_id': user_id, 'name': name, 'email': email, 'age': age}
+            watermark = rows[-1][0]
+            save_watermark(cursor, consumer, watermark)
+            connection.commit()
+    finally:
+        cursor.close()
+        if pool:
+            pool.release(connection)
+        else:
+            connection.close()
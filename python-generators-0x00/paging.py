@@ -0,0 +1,209 @@
+import base64
+import json
+import queue
+import threading
+import time
+
+import seed
+
+# Columns a caller may paginate on. Each non-unique key needs a composite
+# (key, user_id) index from seed.create_table so every page is one range seek.
+KEYSET_COLUMNS = ('user_id', 'age')
+
+def encode_cursor(row, key='user_id'):
+    """Returns an opaque token that resumes pagination right after row."""
+    position = [key, str(row[key]), row['user_id']]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+def decode_cursor(token, key='user_id'):
+    """Returns the (key value, user_id) position stored in a cursor token."""
+    try:
+        token_key, value, user_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except ValueError:
+        raise ValueError(f"Invalid pagination cursor: {token!r}")
+    if token_key != key:
+        raise ValueError(f"Cursor was issued for key {token_key!r}, not {key!r}")
+    return value, user_id
+
+def keyset_query(page_size, key='user_id', after=None):
+    """Builds the seek query for the page following the cursor token after."""
+    if key not in KEYSET_COLUMNS:
+        raise ValueError(f"Cannot paginate on {key!r} (no ({key}, user_id) index), "
+                         f"expected one of {KEYSET_COLUMNS}")
+    query = "SELECT * FROM user_data"
+    params = []
+    if after is not None:
+        value, user_id = decode_cursor(after, key)
+        if key == 'user_id':
+            query += " WHERE user_id > %s"
+            params = [user_id]
+        else:
+            query += f" WHERE ({key}, user_id) > (%s, %s)"
+            params = [value, user_id]
+    order = "user_id" if key == 'user_id' else f"{key}, user_id"
+    query += f" ORDER BY {order} LIMIT %s"
+    params.append(page_size)
+    return query, params
+
+class PagingSession:
+    """One connection and one prepared statement reused for a whole paginated walk.
+
+    Use it as a context manager so the connection is released even when the
+    consuming generator is closed early. Without an explicit connection it
+    checks one out of pool, or dials ALX_prodev when pool is None.
+    """
+
+    def __init__(self, connection=None, pool=None):
+        self._owns_connection = connection is None
+        self.pool = pool
+        if connection is None:
+            connection = pool.acquire() if pool else seed.connect_to_prodev()
+        self.connection = connection
+        self.cursor = self.connection.cursor(prepared=True)
+        self.page_times = []
+        self.rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _execute(self, query, params):
+        start = time.perf_counter()
+        self.cursor.execute(query, params)
+        rows = self.cursor.fetchall()
+        self.page_times.append(time.perf_counter() - start)
+        self.rows += len(rows)
+        return rows
+
+    def fetch_page(self, query, params=()):
+        """Runs one page query and returns its rows as dicts."""
+        rows = self._execute(query, params)
+        columns = self.cursor.column_names
+        return [dict(zip(columns, row)) for row in rows]
+
+    def raw_pages(self, page_size, key='user_id', after=None):
+        """Yields (column names, row tuples) for keyset pages ordered by key."""
+        while True:
+            rows = self._execute(*keyset_query(page_size, key, after))
+            if not rows:
+                break
+            columns = self.cursor.column_names
+            yield columns, rows
+            after = encode_cursor(dict(zip(columns, rows[-1])), key)
+
+    def pages(self, page_size, key='user_id', after=None):
+        """Yields keyset pages of dicts ordered by key, starting after the cursor token."""
+        for columns, rows in self.raw_pages(page_size, key, after):
+            yield [dict(zip(columns, row)) for row in rows]
+
+    def stats(self):
+        """Returns page count, row count and per-page latency figures in seconds."""
+        pages = len(self.page_times)
+        total = sum(self.page_times)
+        return {
+            'pages': pages,
+            'rows': self.rows,
+            'total_seconds': total,
+            'avg_page_seconds': total / pages if pages else 0.0,
+            'max_page_seconds': max(self.page_times, default=0.0),
+        }
+
+    def close(self):
+        if self.cursor is not None:
+            self.cursor.close()
+            self.cursor = None
+        if self._owns_connection and self.connection is not None:
+            if self.pool:
+                self.pool.release(self.connection)
+            else:
+                self.connection.close()
+        self.connection = None
+
+class PrefetchIterator:
+    """Reads ahead from an iterator on a background thread.
+
+    Up to depth items are buffered; stalls and stall_seconds count how often
+    and for how long the consumer had to wait for the producer. Close it
+    (or use it as a context manager) to stop the thread early.
+    """
+
+    _DONE = object()
+
+    def __init__(self, source, depth=2):
+        if depth < 1:
+            raise ValueError("Prefetch depth must be at least 1")
+        self.depth = depth
+        self.items = 0
+        self.stalls = 0
+        self.stall_seconds = 0.0
+        self._buffer = queue.Queue(depth)
+        self._stop = threading.Event()
+        self._error = None
+        self._finished = False
+        self._thread = threading.Thread(target=self._produce, args=(source,), daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, source):
+        try:
+            for item in source:
+                if not self._put(item):
+                    break
+        except Exception as err:
+            self._error = err
+        finally:
+            # Runs the source's own cleanup (e.g. PagingSession) on this thread.
+            if hasattr(source, 'close'):
+                source.close()
+            self._put(self._DONE)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._finished:
+            raise StopIteration
+        try:
+            item = self._buffer.get_nowait()
+        except queue.Empty:
+            start = time.perf_counter()
+            item = self._buffer.get()
+            if item is not self._DONE:
+                self.stalls += 1
+                self.stall_seconds += time.perf_counter() - start
+        if item is self._DONE:
+            self._finished = True
+            self._stop.set()
+            if self._error is not None:
+                raise self._error
+            raise StopIteration
+        self.items += 1
+        return item
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+    def stats(self):
+        return {
+            'items': self.items,
+            'stalls': self.stalls,
+            'stall_seconds': self.stall_seconds,
+            'stall_ratio': self.stalls / self.items if self.items else 0.0,
+        }
@@ -0,0 +1,115 @@
+import multiprocessing
+import queue
+
+import seed
+
+COLUMNS = ('user_id', 'name', 'email', 'age')
+
+def uuid_ranges(partitions):
+    """Splits the user_id key space into contiguous [lower, upper) ranges.
+
+    user_id values are UUID strings, so evenly spaced 8-digit hex prefixes
+    give ranges of roughly equal size; None means unbounded.
+    """
+    bounds = [format(i * 16 ** 8 // partitions, '08x') for i in range(1, partitions)]
+    bounds = [None] + bounds + [None]
+    return list(zip(bounds, bounds[1:]))
+
+def partition_queries(partitions, columns=COLUMNS, strategy='range'):
+    """Returns one (query, params) per partition of user_data."""
+    select = f"SELECT {', '.join(columns)} FROM user_data"
+    if strategy == 'hash':
+        return [(select + " WHERE MOD(CRC32(user_id), %s) = %s", [partitions, bucket])
+                for bucket in range(partitions)]
+    if strategy != 'range':
+        raise ValueError(f"Unknown partitioning strategy: {strategy!r}")
+    queries = []
+    for lower, upper in uuid_ranges(partitions):
+        conditions, params = [], []
+        if lower is not None:
+            conditions.append("user_id >= %s")
+            params.append(lower)
+        if upper is not None:
+            conditions.append("user_id < %s")
+            params.append(upper)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        queries.append((select + where + " ORDER BY user_id", params))
+    return queries
+
+def _scan_partition(index, query, params, batch_size, out):
+    """Worker process: streams one partition onto out, then a None sentinel."""
+    try:
+        connection = seed.connect_to_prodev()
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            out.put(rows)
+        cursor.close()
+        connection.close()
+    except Exception as err:
+        out.put(RuntimeError(f"Partition {index} failed: {err}"))
+    else:
+        out.put(None)
+
+def _next_item(out, workers):
+    """Blocks for the next worker message, failing if a worker died silently."""
+    while True:
+        try:
+            return out.get(timeout=0.5)
+        except queue.Empty:
+            for worker in workers:
+                if worker.exitcode not in (None, 0):
+                    raise RuntimeError(f"{worker.name} exited with code {worker.exitcode}")
+
+def partitioned_scan(parallelism=4, batch_size=1000, columns=COLUMNS,
+                     strategy='range', ordered=False, max_pending=4):
+    """Yields batches of user dicts read by parallelism worker processes.
+
+    Each worker streams one partition ('range' on user_id, or MySQL-only
+    'hash' buckets) into a queue holding at most max_pending batches, so
+    slow consumers stall the workers instead of filling memory. With
+    ordered=True the batches come out in user_id order (range only);
+    otherwise in whatever order the workers deliver them.
+    """
+    if ordered and strategy != 'range':
+        raise ValueError("Ordered scans need the 'range' strategy")
+    queries = partition_queries(parallelism, columns, strategy)
+    if ordered:
+        queues = [multiprocessing.Queue(max_pending) for _ in queries]
+    else:
+        queues = [multiprocessing.Queue(max_pending * parallelism)] * parallelism
+    workers = [
+        multiprocessing.Process(target=_scan_partition, args=(index, query, params, batch_size, out),
+                                name=f"user_data-scan-{index}", daemon=True)
+        for index, ((query, params), out) in enumerate(zip(queries, queues))
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        if ordered:
+            for out in queues:
+                while True:
+                    item = _next_item(out, workers)
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+        else:
+            remaining = parallelism
+            while remaining:
+                item = _next_item(queues[0], workers)
+                if item is None:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import seed
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within the acquire timeout."""
+
+class ConnectionPool:
+    """Thread-safe pool of ALX_prodev connections.
+
+    Keeps between min_size and max_size connections open, health checks
+    idle connections before handing them out, closes ones idle for longer
+    than idle_timeout (down to min_size) and counts checkouts, hits, waits
+    and timeouts in metrics.
+    """
+
+    def __init__(self, connect=seed.connect_to_prodev, min_size=1, max_size=10,
+                 acquire_timeout=5.0, idle_timeout=300.0, health_check=True):
+        if not 0 <= min_size <= max_size:
+            raise ValueError("Expected 0 <= min_size <= max_size")
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self.metrics = {
+            'checkouts': 0,
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'timeouts': 0,
+            'evictions': 0,
+            'failed_health_checks': 0,
+        }
+        self.pid = os.getpid()
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._available = threading.Condition()
+        for _ in range(min_size):
+            self._idle.append((self._open(), time.monotonic()))
+            self._size += 1
+
+    def _count(self, metric):
+        with self._available:
+            self.metrics[metric] += 1
+
+    def _open(self):
+        connection = self.connect()
+        if connection is None:
+            raise ConnectionError("Could not open a database connection")
+        return connection
+
+    def _healthy(self, connection):
+        if not self.health_check or not hasattr(connection, 'is_connected'):
+            return True
+        try:
+            return connection.is_connected()
+        except seed.DatabaseError:
+            return False
+
+    def _discard(self, connection, abort=False):
+        # shutdown() skips draining unread results, which close() would trip over.
+        try:
+            if abort and hasattr(connection, 'shutdown'):
+                connection.shutdown()
+            else:
+                connection.close()
+        except seed.DatabaseError:
+            pass
+
+    def _evict_idle(self):
+        """Closes connections idle past idle_timeout; call with the lock held."""
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size:
+            connection, last_used = self._idle[0]
+            if now - last_used < self.idle_timeout:
+                break
+            self._idle.pop(0)
+            self._size -= 1
+            self.metrics['evictions'] += 1
+            self._discard(connection)
+
+    def acquire(self, timeout=None):
+        """Checks out a connection, waiting up to timeout (default acquire_timeout)."""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        connection = None
+        with self._available:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            self._evict_idle()
+            waited_from = None
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.metrics['timeouts'] += 1
+                    raise PoolTimeout(f"No connection free after {timeout}s")
+                waited_from = waited_from or time.monotonic()
+                self._available.wait(remaining)
+            if waited_from is not None:
+                self.metrics['waits'] += 1
+                self.metrics['wait_seconds'] += time.monotonic() - waited_from
+            self.metrics['checkouts'] += 1
+            if self._idle:
+                connection, _ = self._idle.pop()
+            else:
+                self._size += 1
+
+        if connection is not None:
+            if self._healthy(connection):
+                self._count('hits')
+                return connection
+            self._count('failed_health_checks')
+            self._discard(connection, abort=True)
+        try:
+            connection = self._open()
+        except Exception:
+            with self._available:
+                self._size -= 1
+                self._available.notify()
+            raise
+        self._count('misses')
+        return connection
+
+    def release(self, connection, discard=False):
+        """Returns a connection; discard=True closes it instead (e.g. unread results).
+
+        The open transaction is rolled back first, so the next borrower does
+        not read through a REPEATABLE READ snapshot left by the last one.
+        Connections that fail to roll back are discarded.
+        """
+        if not discard and not self._closed:
+            try:
+                connection.rollback()
+            except seed.DatabaseError:
+                discard = True
+        with self._available:
+            if discard or self._closed:
+                self._size -= 1
+                self._discard(connection, abort=discard)
+            else:
+                self._idle.append((connection, time.monotonic()))
+                self._evict_idle()
+            self._available.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager around acquire/release; errors discard the connection."""
+        connection = self.acquire()
+        try:
+            yield connection
+        except BaseException:
+            self.release(connection, discard=True)
+            raise
+        else:
+            self.release(connection)
+
+    def stats(self):
+        """Returns a snapshot of the metrics plus pool occupancy and hit ratio."""
+        with self._available:
+            stats = dict(self.metrics)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+        checkouts = stats['checkouts']
+        stats['hit_ratio'] = stats['hits'] / checkouts if checkouts else 0.0
+        return stats
+
+    def close(self):
+        """Closes idle connections; checked out ones are closed when released."""
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._available.notify_all()
+        for connection, _ in idle:
+            self._discard(connection)
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+def get_pool(**options):
+    """Returns the process-wide pool, creating it with options on first use.
+
+    A child process (e.g. a partitioned scan worker) gets its own pool
+    rather than sharing sockets inherited from its parent.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None or _default_pool.pid != os.getpid():
+            _default_pool = ConnectionPool(**options)
+        return _default_pool
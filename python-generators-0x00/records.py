@@ -0,0 +1,62 @@
+from collections import namedtuple
+
+USER_COLUMNS = ('user_id', 'name', 'email', 'age')
+
+class UserRecord:
+    """Compact __slots__ user row supporting both user.age and user['age']."""
+
+    __slots__ = USER_COLUMNS
+
+    def __init__(self, user_id, name, email, age):
+        self.user_id = user_id
+        self.name = name
+        self.email = email
+        self.age = age
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __eq__(self, other):
+        if not isinstance(other, UserRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in USER_COLUMNS)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in USER_COLUMNS)
+        return f"UserRecord({fields})"
+
+    def keys(self):
+        return USER_COLUMNS
+
+class UserRow(namedtuple('UserRow', USER_COLUMNS)):
+    """Named tuple user row that also accepts user['age'] lookups."""
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        return super().__getitem__(key)
+
+    def keys(self):
+        return USER_COLUMNS
+
+ROW_FACTORIES = {'dict': dict, 'record': UserRecord, 'tuple': UserRow}
+
+def row_builder(columns, row_factory='dict'):
+    """Returns a function turning a row tuple with the given columns into a row object."""
+    if row_factory not in ROW_FACTORIES:
+        raise ValueError(f"Unknown row factory {row_factory!r}, expected one of {tuple(ROW_FACTORIES)}")
+    if row_factory == 'dict':
+        return lambda row: dict(zip(columns, row))
+    factory = ROW_FACTORIES[row_factory]
+    if tuple(columns) == USER_COLUMNS:
+        return lambda row: factory(*row)
+    positions = [list(columns).index(name) for name in USER_COLUMNS]
+    return lambda row: factory(*[row[position] for position in positions])
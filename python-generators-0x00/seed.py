@@ -1,7 +1,94 @@
 import mysql.connector
 import csv
+import os
+import sqlite3
+import time
 import uuid
 
+# Namespace for user_id values derived from emails by user_id_for.
+USER_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, 'alx-prodev/user_data')
+
+# Catch-all for errors raised by either the MySQL driver or the SQLite stand-in.
+DatabaseError = (mysql.connector.Error, sqlite3.Error)
+
+def to_sqlite(query):
+    """Rewrite the MySQL flavoured SQL used in this project for sqlite3."""
+    return (query.replace("INSERT IGNORE", "INSERT OR IGNORE")
+                 .replace("BIGINT AUTO_INCREMENT PRIMARY KEY", "INTEGER PRIMARY KEY AUTOINCREMENT")
+                 .replace("%s", "?"))
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+class SQLiteCursor:
+    """Cursor exposing the parts of the mysql.connector cursor API we use."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def column_names(self):
+        return tuple(column[0] for column in self._cursor.description)
+
+    def execute(self, query, params=()):
+        self._cursor.execute(to_sqlite(query), params)
+
+    def executemany(self, query, seq_params):
+        self._cursor.executemany(to_sqlite(query), seq_params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+class SQLiteConnection:
+    """sqlite3 stand-in for a mysql.connector connection (local runs and benchmarks)."""
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        # Pools hand connections to other threads, one user at a time.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+
+    def cursor(self, dictionary=False, **kwargs):
+        cursor = self._conn.cursor()
+        if dictionary:
+            cursor.row_factory = _dict_row
+        return SQLiteCursor(cursor)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+    def shutdown(self):
+        self._conn.close()
+
+    def is_connected(self):
+        try:
+            self._conn.execute("SELECT 1")
+        except sqlite3.ProgrammingError:
+            return False
+        return True
+
 def connect_db():
     try:
         return mysql.connector.connect(
@@ -19,6 +106,10 @@ def create_database(connection):
     cursor.close()
 
 def connect_to_prodev():
+    # PRODEV_SQLITE=<path> points every generator at a SQLite stand-in instead.
+    sqlite_path = os.environ.get('PRODEV_SQLITE')
+    if sqlite_path:
+        return connect_sqlite(sqlite_path)
     try:
         return mysql.connector.connect(
             host='localhost',
@@ -30,6 +121,10 @@ def connect_to_prodev():
         print(f"Error: {err}")
         return None
 
+def connect_sqlite(path=':memory:'):
+    """Open a SQLite database that can stand in for ALX_prodev."""
+    return SQLiteConnection(path)
+
 def create_table(connection):
     cursor = connection.cursor()
     cursor.execute("""
@@ -40,12 +135,68 @@ def create_table(connection):
             age DECIMAL NOT NULL
         );
     """)
+    # Changelog read by cdc.stream_changes: one row per inserted or updated user.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_data_changes (
+            seq BIGINT AUTO_INCREMENT PRIMARY KEY,
+            user_id VARCHAR(36) NOT NULL
+        );
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cdc_watermarks (
+            consumer VARCHAR(64) PRIMARY KEY,
+            seq BIGINT NOT NULL
+        );
+    """)
+    # Users per age, rebuilt by the loaders so age filters and averages can
+    # be answered from a handful of buckets.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_age_histogram (
+            age DECIMAL PRIMARY KEY,
+            users BIGINT NOT NULL
+        );
+    """)
+    # Serves age range scans and the (age, user_id) keyset seek in paging.py.
+    _create_index(cursor, 'idx_user_data_age_user_id', 'user_data', 'age', 'user_id')
     connection.commit()
     cursor.close()
     print("Table user_data created successfully")
 
+def _create_index(cursor, name, table, *columns):
+    """Creates an index, tolerating one that already exists (MySQL has no IF NOT EXISTS)."""
+    try:
+        cursor.execute(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})")
+    except DatabaseError as err:
+        if getattr(err, 'errno', None) != 1061 and 'already exists' not in str(err):
+            raise
+
+def refresh_age_histogram(cursor):
+    """Rebuilds user_age_histogram from user_data (an index-only scan on age)."""
+    cursor.execute("DELETE FROM user_age_histogram")
+    cursor.execute("""
+        INSERT INTO user_age_histogram (age, users)
+        SELECT age, COUNT(*) FROM user_data GROUP BY age
+    """)
+
+def load_age_histogram(connection):
+    """Returns the precomputed {age: users} histogram, empty if never built."""
+    cursor = connection.cursor()
+    cursor.execute("SELECT age, users FROM user_age_histogram ORDER BY age")
+    histogram = {float(age): users for age, users in cursor.fetchall()}
+    cursor.close()
+    return histogram
+
+def record_changes(cursor, user_ids):
+    """Appends the given user_ids to the user_data_changes changelog."""
+    if user_ids:
+        cursor.executemany(
+            "INSERT INTO user_data_changes (user_id) VALUES (%s)",
+            [(user_id,) for user_id in user_ids]
+        )
+
 def insert_data(connection, csv_file):
     cursor = connection.cursor()
+    user_ids = []
     with open(csv_file, newline='') as file:
         reader = csv.DictReader(file)
         for row in reader:
@@ -54,5 +205,161 @@ def insert_data(connection, csv_file):
                 INSERT IGNORE INTO user_data (user_id, name, email, age)
                 VALUES (%s, %s, %s, %s)
             """, (user_id, row['name'], row['email'], row['age']))
+            if cursor.rowcount:
+                user_ids.append(user_id)
+    record_changes(cursor, user_ids)
+    refresh_age_histogram(cursor)
     connection.commit()
     cursor.close()
+
+def _read_chunks(csv_file, chunk_size):
+    """Yields lists of (name, email, age) tuples read from the CSV file."""
+    with open(csv_file, newline='') as file:
+        chunk = []
+        for row in csv.DictReader(file):
+            chunk.append((row['name'], row['email'], row['age']))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def insert_rows(cursor, chunk, deterministic_ids=False):
+    """Inserts a chunk with one multi-row INSERT IGNORE and returns the rows written.
+
+    With deterministic_ids the user_id comes from user_id_for(email), so
+    inserting rows that are already loaded is a no-op. Only the user_ids
+    actually inserted are logged to the changelog.
+    """
+    placeholders = ", ".join(["(%s, %s, %s, %s)"] * len(chunk))
+    params = []
+    user_ids = []
+    for name, email, age in chunk:
+        user_id = user_id_for(email) if deterministic_ids else str(uuid.uuid4())
+        user_ids.append(user_id)
+        params.extend((user_id, name, email, age))
+    # Fresh uuid4s never collide, so only derived ids can hit existing rows
+    # or repeat within the chunk.
+    new_ids = dict.fromkeys(user_ids)
+    if deterministic_ids:
+        cursor.execute(
+            f"SELECT user_id FROM user_data WHERE user_id IN ({', '.join(['%s'] * len(new_ids))})",
+            list(new_ids)
+        )
+        for (user_id,) in cursor.fetchall():
+            del new_ids[user_id]
+    cursor.execute(
+        f"INSERT IGNORE INTO user_data (user_id, name, email, age) VALUES {placeholders}",
+        params
+    )
+    inserted = cursor.rowcount
+    record_changes(cursor, list(new_ids))
+    return inserted
+
+def _load_data_infile(cursor, csv_file):
+    """Bulk loads the CSV server side; the connection needs allow_local_infile=True."""
+    cursor.execute("""
+        LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE user_data
+        FIELDS TERMINATED BY ',' ENCLOSED BY '"'
+        LINES TERMINATED BY '\\n'
+        IGNORE 1 LINES
+        (name, email, age)
+        SET user_id = UUID()
+    """, (csv_file,))
+    return cursor.rowcount
+
+def insert_data_bulk(connection, csv_file, chunk_size=1000, load_data=False):
+    """Loads the CSV in chunks of multi-row inserts and reports throughput.
+
+    With load_data=True the whole file is handed to LOAD DATA LOCAL INFILE
+    instead (MySQL only); that path generates ids server side and does not
+    feed the user_data_changes changelog.
+    """
+    start = time.perf_counter()
+    cursor = connection.cursor()
+    try:
+        if load_data:
+            with open(csv_file, newline='') as file:
+                total = sum(1 for _ in csv.reader(file)) - 1
+            inserted = _load_data_infile(cursor, csv_file)
+        else:
+            total = inserted = 0
+            for chunk in _read_chunks(csv_file, chunk_size):
+                inserted += insert_rows(cursor, chunk)
+                total += len(chunk)
+        refresh_age_histogram(cursor)
+        connection.commit()
+    finally:
+        cursor.close()
+    elapsed = time.perf_counter() - start
+    stats = {
+        'rows': total,
+        'inserted': inserted,
+        'ignored': total - inserted,
+        'seconds': elapsed,
+        'rows_per_sec': total / elapsed if elapsed else 0.0,
+    }
+    print(f"Loaded {stats['rows']} rows ({stats['ignored']} ignored) "
+          f"in {elapsed:.2f}s, {stats['rows_per_sec']:.0f} rows/sec")
+    return stats
+
+def user_id_for(email):
+    """Derives a stable user_id from the email so reloads map onto the same row."""
+    return str(uuid.uuid5(USER_ID_NAMESPACE, email.strip().lower()))
+
+def _upsert_chunk(cursor, chunk):
+    """Writes only the new or changed rows of a chunk; returns (inserted, updated)."""
+    rows = {user_id_for(email): (name, email, age) for name, email, age in chunk}
+    placeholders = ", ".join(["%s"] * len(rows))
+    cursor.execute(
+        f"SELECT user_id, name, email, age FROM user_data WHERE user_id IN ({placeholders})",
+        list(rows)
+    )
+    existing = {user_id: (name, email, float(age)) for user_id, name, email, age in cursor.fetchall()}
+    new, changed = [], []
+    for user_id, (name, email, age) in rows.items():
+        current = existing.get(user_id)
+        if current is None:
+            new.append((user_id, name, email, age))
+        elif current != (name, email, float(age)):
+            changed.append((name, email, age, user_id))
+    if new:
+        cursor.executemany(
+            "INSERT INTO user_data (user_id, name, email, age) VALUES (%s, %s, %s, %s)", new
+        )
+    if changed:
+        cursor.executemany(
+            "UPDATE user_data SET name = %s, email = %s, age = %s WHERE user_id = %s", changed
+        )
+    record_changes(cursor, [row[0] for row in new] + [row[3] for row in changed])
+    return len(new), len(changed)
+
+def upsert_data(connection, csv_file, chunk_size=1000):
+    """Idempotently loads the CSV: rows are keyed by user_id_for(email) and only
+    new or changed rows are written, so reloading a CSV never duplicates users.
+    """
+    start = time.perf_counter()
+    cursor = connection.cursor()
+    total = inserted = updated = 0
+    try:
+        for chunk in _read_chunks(csv_file, chunk_size):
+            chunk_inserted, chunk_updated = _upsert_chunk(cursor, chunk)
+            inserted += chunk_inserted
+            updated += chunk_updated
+            total += len(chunk)
+        refresh_age_histogram(cursor)
+        connection.commit()
+    finally:
+        cursor.close()
+    elapsed = time.perf_counter() - start
+    stats = {
+        'rows': total,
+        'inserted': inserted,
+        'updated': updated,
+        'unchanged': total - inserted - updated,
+        'seconds': elapsed,
+        'rows_per_sec': total / elapsed if elapsed else 0.0,
+    }
+    print(f"Upserted {stats['rows']} rows ({inserted} new, {updated} changed, "
+          f"{stats['unchanged']} unchanged) in {elapsed:.2f}s, {stats['rows_per_sec']:.0f} rows/sec")
+    return stats
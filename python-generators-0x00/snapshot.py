@@ -0,0 +1,59 @@
+from paging import PagingSession
+from records import USER_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for user_data snapshots")
+
+def snapshot_schema():
+    _require_pyarrow()
+    return pa.schema([
+        ('user_id', pa.string()),
+        ('name', pa.string()),
+        ('email', pa.string()),
+        ('age', pa.float64()),
+    ])
+
+def export_snapshot(path, row_group_size=100000, compression='zstd', pool=None):
+    """Writes user_data to a compressed Parquet file, one row group per keyset page.
+
+    Only one page is held in memory at a time. Returns the number of rows
+    written.
+    """
+    schema = snapshot_schema()
+    rows_written = 0
+    with PagingSession(pool=pool) as session, \
+            pq.ParquetWriter(path, schema, compression=compression) as writer:
+        for columns, rows in session.raw_pages(row_group_size):
+            values = dict(zip(columns, zip(*rows)))
+            writer.write_table(pa.table({
+                'user_id': values['user_id'],
+                'name': values['name'],
+                'email': values['email'],
+                'age': [float(age) for age in values['age']],
+            }, schema=schema))
+            rows_written += len(rows)
+    return rows_written
+
+def read_snapshot(path, columns=USER_COLUMNS, batch_size=65536):
+    """Yields pyarrow RecordBatches from a memory-mapped snapshot file."""
+    _require_pyarrow()
+    with pa.memory_map(path) as source:
+        parquet = pq.ParquetFile(source)
+        yield from parquet.iter_batches(batch_size, columns=list(columns))
+
+def snapshot_users(path, batch_size=65536):
+    """Yields users from a snapshot as dicts, like stream_users."""
+    for batch in read_snapshot(path, batch_size=batch_size):
+        yield from batch.to_pylist()
+
+def snapshot_ages(path, batch_size=65536):
+    """Yields ages from a snapshot as floats, like stream_user_ages."""
+    for batch in read_snapshot(path, ('age',), batch_size):
+        yield from batch.column(0).to_pylist()